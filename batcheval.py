@@ -0,0 +1,210 @@
+import re
+import sys
+import json
+import math
+import argparse
+from itertools import islice
+import numpy as np
+from expression import compiled, evaluate, formatResult, ExpressionError
+
+# Expressions are read and evaluated this many at a time, so output starts
+# streaming before the input ends and each chunk is big enough to group.
+CHUNK_LINES = 4096
+# Shapes seen fewer times than this in a chunk are cheaper to run one by one.
+VECTOR_MIN_ROWS = 8
+# Operators whose float64 result is bit-for-bit what run() computes, as long
+# as no operand or intermediate leaves the range where ints are exact.
+VECTOR_OPS = {"+", "-", "*", "/", "mod", "neg", "pos", "sqrt", "pct"}
+EXACT_INT = 2 ** 53
+
+# Same grammar as expression.scan for a number, exponent included.
+NUMBER = re.compile(r"[0-9.]+(?:[eE][+-]?\d+)?")
+
+
+def shape_of(text):
+    # "3+4×2" and "10+1.5×7" share the shape "1+1×1": replacing every
+    # literal with a placeholder leaves one template to compile per shape.
+    return NUMBER.sub("1", text), NUMBER.findall(text)
+
+
+def template_slots(code):
+    # Placeholders compile to the int 1; π is a float and operators are str.
+    if any(isinstance(op, str) and op not in VECTOR_OPS for op in code):
+        return None
+    return [index for index, op in enumerate(code) if type(op) is int]
+
+
+def float_or_nan(literal):
+    try:
+        return float(literal)
+    except ValueError:
+        return math.nan
+
+
+def parse_rows(rows, width):
+    # All literals of a group go through float() in one pass; whether each
+    # one is an int in run()'s eyes only depends on its spelling. Malformed
+    # numbers ("1.2.3") become NaN, so their rows take the scalar path, which
+    # reports them properly.
+    flat = [literal for row in rows for literal in row]
+    try:
+        values = list(map(float, flat))
+    except ValueError:
+        values = list(map(float_or_nan, flat))
+    columns = np.array(values, dtype=np.float64).reshape(len(rows), width)
+    integral = np.array(["." not in literal and "e" not in literal and "E" not in literal for literal in flat],
+                        dtype=bool).reshape(len(rows), width)
+    # Huge ints stay exact in run() and literals past the float range become
+    # Approx there, so those rows are left out too.
+    usable = (np.isfinite(columns) & ~(integral & (np.abs(columns) >= EXACT_INT))).all(axis=1)
+    return columns, integral, usable
+
+
+def run_vector(code, slots, columns, integral):
+    # Runs the postfix code once over a column per literal. Alongside every
+    # value column goes an "is int" column, since run() keeps ints exact and
+    # formats 6 and 6.0 differently. Rows where float64 could disagree with
+    # run() (division by zero, big ints, overflow, negative roots, float
+    # modulo) are marked and left to the scalar path.
+    count = len(columns)
+    fallback = np.zeros(count, dtype=bool)
+    slot_column = {index: column for column, index in enumerate(slots)}
+    stack = []
+    with np.errstate(all="ignore"):
+        for index, op in enumerate(code):
+            if index in slot_column:
+                column = slot_column[index]
+                stack.append((columns[:, column], integral[:, column]))
+                continue
+            if not isinstance(op, str):
+                stack.append((np.full(count, op), np.zeros(count, dtype=bool)))
+                continue
+            if op in ("neg", "pos", "sqrt", "pct"):
+                a, a_int = stack.pop()
+                if op == "neg":
+                    value, is_int = -a, a_int
+                elif op == "pos":
+                    value, is_int = a, a_int
+                elif op == "sqrt":
+                    fallback |= a < 0
+                    value, is_int = np.sqrt(a), np.zeros(count, dtype=bool)
+                else:
+                    value, is_int = a / 100, np.zeros(count, dtype=bool)
+            else:
+                b, b_int = stack.pop()
+                a, a_int = stack.pop()
+                if op == "+":
+                    value, is_int = a + b, a_int & b_int
+                elif op == "-":
+                    value, is_int = a - b, a_int & b_int
+                elif op == "*":
+                    value, is_int = a * b, a_int & b_int
+                elif op == "/":
+                    fallback |= b == 0
+                    value, is_int = a / b, np.zeros(count, dtype=bool)
+                else:
+                    is_int = a_int & b_int
+                    fallback |= (b == 0) | ~is_int
+                    value = np.mod(a, b)
+            # Exact ints have no negative zero, but float64 makes one out of
+            # -0 or 0×-3, and it would survive into a later float result.
+            # Adding 0.0 turns -0.0 into 0.0 and leaves everything else alone.
+            value = np.where(is_int, value + 0.0, value)
+            fallback |= ~np.isfinite(value) | (is_int & (np.abs(value) >= EXACT_INT))
+            stack.append((value, is_int))
+    value, is_int = stack[-1]
+    return value.tolist(), is_int.tolist(), fallback.tolist()
+
+
+def evaluate_one(text):
+    try:
+        return evaluate(text), None
+    except ExpressionError as e:
+        return None, str(e)
+
+
+def evaluateBatch(texts, vectorize=True):
+    # Returns one (value, error) pair per text, in order; error is None on
+    # success and value is None on failure. Results are the same as calling
+    # evaluate() on each text.
+    results = [None] * len(texts)
+    groups = {}
+    if vectorize:
+        for index, text in enumerate(texts):
+            template, literals = shape_of(text)
+            groups.setdefault(template, []).append((index, literals))
+
+    for template, members in groups.items():
+        if len(members) < VECTOR_MIN_ROWS:
+            continue
+        try:
+            code = compiled(template)
+        except ExpressionError:
+            continue
+        slots = template_slots(code)
+        if slots is None or not slots:
+            continue
+        # A literal glued to a following "e5" reads differently once it
+        # becomes a placeholder; a count mismatch catches that.
+        members = [(index, literals) for index, literals in members if len(literals) == len(slots)]
+        if len(members) < VECTOR_MIN_ROWS:
+            continue
+        columns, integral, usable = parse_rows([literals for _, literals in members], len(slots))
+        values, integral, fallback = run_vector(code, slots, columns[usable], integral[usable])
+        indices = [index for (index, _), keep in zip(members, usable.tolist()) if keep]
+        for index, value, is_int, skip in zip(indices, values, integral, fallback):
+            if not skip:
+                results[index] = (int(value) if is_int else value, None)
+
+    for index, text in enumerate(texts):
+        if results[index] is None:
+            results[index] = evaluate_one(text)
+    return results
+
+
+def evaluateLines(lines, chunk=CHUNK_LINES, vectorize=True):
+    # Yields (text, value, error) for every line, chunk by chunk, so a
+    # generator over stdin produces output while input is still arriving.
+    lines = iter(lines)
+    while True:
+        texts = [line.strip() for line in islice(lines, chunk)]
+        if not texts:
+            return
+        for text, (value, error) in zip(texts, evaluateBatch(texts, vectorize)):
+            yield text, value, error
+
+
+def writeResults(records, output, as_json=False):
+    count = 0
+    for text, value, error in records:
+        if as_json:
+            record = {"expression": text, "error": error} if error else {"expression": text, "result": formatResult(value)}
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            output.write(f"Error: {error}\n" if error else formatResult(value) + "\n")
+        count += 1
+    output.flush()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate one calculator expression per line, writing one result per line.")
+    parser.add_argument("input", nargs="?", default="-", help="file of expressions (default: stdin)")
+    parser.add_argument("-o", "--output", help="write results here instead of stdout")
+    parser.add_argument("--json", action="store_true", help="write JSON lines with the expression and its result or error")
+    parser.add_argument("--chunk", type=int, default=CHUNK_LINES, help="expressions evaluated per batch")
+    parser.add_argument("--no-vector", action="store_true", help="evaluate every expression on its own")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        writeResults(evaluateLines(source, max(1, args.chunk), not args.no_vector), output, args.json)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from imgconv import listImages
+from fetchcolors import extractPalette, QUALITY_BUDGETS
+from quantizers import QUANTIZERS, DEFAULT_QUANTIZER
+
+def processImage(task):
+    path, setting, top, quantizer = task
+    start = time.perf_counter()
+    try:
+        palette = extractPalette(path, setting, quantizer)
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "path": path,
+        "accent": palette.accent,
+        "accents": palette.accents,
+        "scored": palette.seeds()[:top],
+        "ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+def batchFetch(folder, setting="exact", workers=None, top=4, recursive=False, output=sys.stdout, quantizer=DEFAULT_QUANTIZER):
+    tasks = [(path, setting, top, quantizer) for path in listImages(folder, recursive)]
+    if not tasks:
+        return 0
+
+    workers = workers or os.cpu_count() or 1
+    # A few tasks per chunk keeps IPC overhead low on thousands of small
+    # files without leaving workers idle at the tail of the run.
+    chunksize = max(1, min(16, len(tasks) // (workers * 4)))
+    with multiprocessing.Pool(processes=workers) as pool:
+        for record in pool.imap_unordered(processImage, tasks, chunksize):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    return len(tasks)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract accent colors for every image in a folder as JSON lines.")
+    parser.add_argument("folder", nargs="?", default="fetch_img")
+    parser.add_argument("-q", "--quality", choices=sorted(QUALITY_BUDGETS), default="exact")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("-m", "--quantizer", choices=sorted(QUANTIZERS), default=DEFAULT_QUANTIZER)
+    parser.add_argument("-n", "--top", type=int, default=4, help="number of scored colors per record")
+    parser.add_argument("-r", "--recursive", action="store_true")
+    parser.add_argument("-o", "--output", help="write JSONL here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"'{args.folder}' is not a directory")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            batchFetch(args.folder, args.quality, args.workers, args.top, args.recursive, output, args.quantizer)
+    else:
+        batchFetch(args.folder, args.quality, args.workers, args.top, args.recursive, quantizer=args.quantizer)
+
+if __name__ == "__main__":
+    main()
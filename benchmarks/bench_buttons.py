@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from PySide6.QtWidgets import QApplication
+from main import CalculatorWindow
+
+def pressReleaseLegacy(window, text, button):
+    # What on_button_pressed/on_button_released did before the compiled
+    # stylesheet: build a QSS string and re-polish the button, twice.
+    theme = window.theme
+    button.setStyleSheet(
+        f"border-radius: 40px; background-color: {theme['primary']}; color: {theme['onPrimary']}; border: 2px solid {theme['outline']};"
+    )
+    button.repaint()
+    background = theme["secondaryContainer"] if window.button_tones[text] == "light" else theme["primaryContainer"]
+    button.setStyleSheet(
+        f"border-radius: 40px; background-color: {background}; color: {theme['onSurface']};"
+    )
+    button.repaint()
+
+def pressRelease(window, text, button):
+    button.setDown(True)
+    button.repaint()
+    button.setDown(False)
+    button.repaint()
+
+def measure(window, function, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, button in window.button_widgets.items():
+            function(window, text, button)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(window.button_widgets)) * 1e6
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Press/release latency across all calculator buttons")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = CalculatorWindow()
+    window.show()
+    app.processEvents()
+
+    # Warm up both paths before timing.
+    measure(window, pressRelease, 2)
+    legacy = measure(window, pressReleaseLegacy, args.rounds)
+    for button in window.button_widgets.values():
+        button.setStyleSheet("")
+    app.processEvents()
+    measure(window, pressRelease, 2)
+    current = measure(window, pressRelease, args.rounds)
+
+    print(f"buttons: {len(window.button_widgets)}, rounds: {args.rounds}")
+    print(f"before (setStyleSheet per press/release): {legacy:8.1f} us")
+    print(f"after  (compiled sheet, :pressed state):  {current:8.1f} us")
+    print(f"speedup: {legacy / current:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expression import compileExpression, run
+
+def longExpression(operators, seed=0):
+    rng = random.Random(seed)
+    parts = [str(rng.randint(1, 9))]
+    for _ in range(operators):
+        op = rng.choice("+-×÷")
+        operand = str(rng.randint(1, 9))
+        choice = rng.random()
+        if choice < 0.1:
+            operand = f"√{operand}"
+        elif choice < 0.15:
+            operand = "π"
+        elif choice < 0.2:
+            operand = f"({operand}+{rng.randint(1, 9)})"
+        parts.append(op + operand)
+    return "".join(parts)
+
+def timeit(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expression engine scaling benchmark")
+    parser.add_argument("--sizes", default="100,200,400,800,1600,3200")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"{'operators':>10} {'compile ms':>11} {'run ms':>9} {'ns/operator':>12}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        text = longExpression(size)
+        compile_time = timeit(lambda: compileExpression(text), args.repeat)
+        code = compileExpression(text)
+        run_time = timeit(lambda: run(code), args.repeat)
+        per_operator = (compile_time + run_time) / size * 1e9
+        print(f"{size:>10} {compile_time * 1000:>11.3f} {run_time * 1000:>9.3f} {per_operator:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import time
+import math
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from materialyoucolor.score.score import Score
+from materialyoucolor.utils.color_utils import lab_from_argb
+from fetchcolors import MAX_COLORS, QUALITY_BUDGETS, reduceForQuality, pixelArray, int_to_hex
+from imgconv import listImages
+from quantizers import QUANTIZERS
+from run import syntheticImage
+
+def deltaE(first, second):
+    # CIE76: plain Euclidean distance in L*a*b*; ~2.3 is a just-noticeable
+    # difference.
+    return math.dist(lab_from_argb(first), lab_from_argb(second))
+
+def accents(result):
+    dominant = max(result, key=result.get)
+    return dominant, Score.score(result)[0]
+
+def fixtures(folder, sizes, images):
+    paths = [syntheticImage(os.path.join(folder, f"synthetic_{index}_{size}mp.png"), size, seed=index)
+             for index, size in enumerate(sizes)]
+    if images:
+        paths.extend(listImages(images))
+    return paths
+
+def compare(paths, setting, repeat, backends):
+    rows = []
+    for path in paths:
+        with Image.open(path) as image:
+            pixels = pixelArray(reduceForQuality(image, setting))
+        measured = {}
+        for name in backends:
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = QUANTIZERS[name](pixels, MAX_COLORS)
+                best = min(best, time.perf_counter() - start)
+            measured[name] = (best, accents(result), len(result))
+        reference = measured["celebi"][1]
+        for name, (seconds, (dominant, seed), colors) in measured.items():
+            rows.append({
+                "image": os.path.basename(path),
+                "pixels": len(pixels),
+                "quantizer": name,
+                "ms": round(seconds * 1000, 2),
+                "colors": colors,
+                "dominant": int_to_hex(dominant),
+                "seed": int_to_hex(seed),
+                "dominant_delta_e": round(deltaE(dominant, reference[0]), 2),
+                "seed_delta_e": round(deltaE(seed, reference[1]), 2),
+            })
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runtime and accent difference of each quantizer against Celebi")
+    parser.add_argument("--sizes", default="0.5,2,8", help="synthetic fixture sizes in megapixels")
+    parser.add_argument("--images", help="also include every image in this folder")
+    parser.add_argument("-q", "--quality", choices=sorted(QUALITY_BUDGETS), default="exact")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    backends = ["celebi"] + [name for name in QUANTIZERS if name != "celebi"]
+    with tempfile.TemporaryDirectory() as folder:
+        paths = fixtures(folder, [float(size) for size in args.sizes.split(",") if size], args.images)
+        rows = compare(paths, args.quality, args.repeat, backends)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'image':28} {'quantizer':9} {'ms':>9} {'colors':>6} {'dominant':>8} {'dE':>6} {'seed':>8} {'dE':>6}")
+    for row in rows:
+        print(f"{row['image'][:28]:28} {row['quantizer']:9} {row['ms']:>9.1f} {row['colors']:>6} "
+              f"{row['dominant']:>8} {row['dominant_delta_e']:>6.2f} {row['seed']:>8} {row['seed_delta_e']:>6.2f}")
+
+    print(f"\n{'quantizer':9} {'total ms':>10} {'speedup':>8} {'mean seed dE':>13}")
+    totals = {name: sum(row["ms"] for row in rows if row["quantizer"] == name) for name in backends}
+    for name in backends:
+        deltas = [row["seed_delta_e"] for row in rows if row["quantizer"] == name]
+        print(f"{name:9} {totals[name]:>10.1f} {totals['celebi'] / totals[name]:>7.1f}x {sum(deltas) / len(deltas):>13.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside a fresh interpreter. Times are wall-clock seconds since the
+# epoch so the parent can subtract its own launch time, which includes
+# interpreter startup.
+CHILD = r"""
+import os, sys, json, time
+sys.path.insert(0, sys.argv[1])
+from PySide6.QtCore import QObject, QEvent, QTimer
+stamps = {"started": time.time()}
+loaded = []
+import main
+stamps["imported"] = time.time()
+app = main.QApplication(sys.argv[:1])
+
+class FirstPaint(QObject):
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Paint and "first_frame" not in stamps:
+            stamps["first_frame"] = time.time()
+            loaded.extend(m for m in ("PIL", "numpy", "cairo", "keyboard", "materialyoucolor") if m in sys.modules)
+        return False
+
+window = main.MainWindow()
+stamps["constructed"] = time.time()
+watcher = FirstPaint()
+window.installEventFilter(watcher)
+window.show()
+
+def poll():
+    if window.assets_ready:
+        stamps["assets_ready"] = time.time()
+        app.quit()
+
+timer = QTimer()
+timer.timeout.connect(poll)
+timer.start(1)
+QTimer.singleShot(30000, app.quit)
+app.exec()
+print("STAMPS " + json.dumps({"heavy": loaded, **stamps}))
+"""
+
+def parseImportTime(stderr, top):
+    # "import time: self [us] | cumulative | imported package"; only
+    # top-level entries (no leading indentation) are kept.
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("  "):
+            continue
+        name = name.strip()
+        packages[name] = packages.get(name, 0) + int(cumulative) / 1000
+    return sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+def prepareWorkdir(workdir):
+    # The app reads assets/ and config/ relative to the working directory and
+    # renders into cache/assets/, so each run starts from its own copy.
+    for folder in ("assets", "config"):
+        shutil.copytree(os.path.join(ROOT, folder), os.path.join(workdir, folder), dirs_exist_ok=True)
+
+def runOnce(workdir, pycache):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", PYTHONPYCACHEPREFIX=pycache)
+    launched = time.time()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, ROOT],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    stamps = None
+    for line in process.stdout.splitlines():
+        if line.startswith("STAMPS "):
+            stamps = json.loads(line[len("STAMPS "):])
+    if stamps is None:
+        raise RuntimeError(f"Startup run failed:\n{process.stderr[-2000:]}")
+    result = {"heavy_at_first_frame": stamps.pop("heavy")}
+    for name, stamp in stamps.items():
+        result[name + "_ms"] = (stamp - launched) * 1000
+    return result, process.stderr
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold and warm time-to-first-frame on the offscreen platform")
+    parser.add_argument("--warm-runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="import-time entries to show")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir, tempfile.TemporaryDirectory() as pycache:
+        prepareWorkdir(workdir)
+        # Cold: no bytecode cache for anything (PYTHONPYCACHEPREFIX points at
+        # an empty folder) and no icon atlas, so the first run compiles every
+        # module and renders every icon. The OS file cache is left alone.
+        cold, cold_stderr = runOnce(workdir, pycache)
+        warm = [runOnce(workdir, pycache) for _ in range(args.warm_runs)]
+
+    warm_results = [result for result, _ in warm]
+    keys = [key for key in cold if key.endswith("_ms")]
+    summary = {
+        "cold": cold,
+        "warm_median": {key: sorted(result[key] for result in warm_results)[len(warm_results) // 2] for key in keys} if warm_results else {},
+        "imports_cold": parseImportTime(cold_stderr, args.top),
+        "imports_warm": parseImportTime(warm[-1][1], args.top) if warm else [],
+    }
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"{'':20}{'cold':>10}{'warm':>10}")
+    for key in keys:
+        print(f"{key:20}{cold[key]:10.1f}{summary['warm_median'].get(key, float('nan')):10.1f}")
+    # materialyoucolor is expected here: theme resolves the window's colour
+    # roles from it before the first frame can be painted.
+    print(f"heavy modules loaded at first frame: {', '.join(cold['heavy_at_first_frame']) or 'none'}")
+    for label in ("imports_cold", "imports_warm"):
+        print(f"\n{label} (cumulative ms, top-level)")
+        for name, ms in summary[label]:
+            print(f"  {ms:8.1f}  {name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import statistics
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_THRESHOLD = 0.15
+
+# A case is (name, run, prepare). prepare() runs untimed before every repeat
+# so "cold" cases can throw away whatever the previous repeat cached. Every
+# group gets wanted(name) and checks its case names before importing
+# anything or building fixtures, so -k never pays for groups it skips.
+
+def syntheticImage(path, megapixels, seed=0):
+    import numpy as np
+    from PIL import Image
+    # A coarse random colour field upscaled smoothly, plus grain: a few large
+    # dominant regions like a wallpaper, and enough distinct colours that the
+    # quantizer does real work.
+    rng = np.random.default_rng(seed)
+    width = int((megapixels * 1e6 * 16 / 9) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    field = Image.fromarray(rng.integers(0, 256, (6, 10, 3), dtype=np.uint8), "RGB").resize((width, height), Image.BICUBIC)
+    pixels = np.asarray(field, dtype=np.int16)
+    pixels = pixels + rng.integers(-6, 7, pixels.shape, dtype=np.int16)
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB").save(path)
+    return path
+
+def fetchCases(fixtures, sizes, wanted):
+    cases = []
+    for megapixels in sizes:
+        names = [f"fetchColor[{megapixels}mp,{setting},cold]" for setting in ("fast", "exact")]
+        names.append(f"fetchColor[{megapixels}mp,exact,cached]")
+        if not any(map(wanted, names)):
+            continue
+        import fetchcolors
+        from palettecache import palette_cache
+        palette_cache.folder = os.path.join(fixtures, "palettes")
+        path = syntheticImage(os.path.join(fixtures, f"image_{megapixels}mp.png"), megapixels)
+        for setting in ("fast", "exact"):
+            run = lambda path=path, setting=setting: fetchcolors.fetchColor(path, setting, False)
+            cases.append((f"fetchColor[{megapixels}mp,{setting},cold]", run, palette_cache.clear))
+        cases.append((f"fetchColor[{megapixels}mp,exact,cached]", lambda path=path: fetchcolors.fetchColor(path, "exact", False), None))
+    return cases
+
+def convertCases(fixtures, wanted, count=8, megapixels=2):
+    names = [f"convertImage[{count}x{megapixels}mp,{state}]" for state in ("cold", "unchanged")]
+    if not any(map(wanted, names)):
+        return []
+    from imgconv import convertImage
+    source = os.path.join(fixtures, "imgconv")
+    os.makedirs(source, exist_ok=True)
+    for index in range(count):
+        syntheticImage(os.path.join(source, f"wallpaper_{index}.png"), megapixels, seed=index)
+    output = os.path.join(fixtures, "converted")
+    manifest = os.path.join(fixtures, "imgconv_manifest.json")
+
+    def reset():
+        shutil.rmtree(output, ignore_errors=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(manifest)
+
+    def run():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            convertImage(source, output, manifest)
+
+    return [(names[0], run, reset), (names[1], run, None)]
+
+def svgCases(fixtures, wanted):
+    if not any(map(wanted, ("modifySvg[cold]", "modifySvg[unchanged]"))):
+        return []
+    from modifysvg import modifySvg
+    output = os.path.join(fixtures, "assets")
+    assets = os.path.join(ROOT, "assets")
+    run = lambda: modifySvg("#3F6A8A", input_folder=assets, output_folder=output)
+    return [
+        ("modifySvg[cold]", run, lambda: shutil.rmtree(output, ignore_errors=True)),
+        ("modifySvg[unchanged]", run, None),
+    ]
+
+def expressionCases(lengths, wanted):
+    cases = []
+    for operators in lengths:
+        name = f"evaluate[{operators}ops,cold]"
+        if not wanted(name):
+            continue
+        from bench_expression import longExpression
+        from expression import evaluate, compiled
+        text = longExpression(operators)
+        cases.append((name, lambda text=text: evaluate(text), compiled.cache_clear))
+    return cases
+
+def batchCases(wanted, count=20000):
+    names = [f"evaluateBatch[{count},{kind}]" for kind in ("same-shape", "same-shape,scalar", "mixed")]
+    if not any(map(wanted, names)):
+        return []
+    import random
+    from batcheval import evaluateBatch
+    rng = random.Random(0)
+    # One repeated shape (the vectorized path) and a mix that includes
+    # shapes it can't take.
+    same = [f"{rng.randint(1, 999)}+{rng.uniform(1, 99):.3f}×{rng.randint(1, 50)}÷({rng.randint(1, 9)}-{rng.randint(10, 20)})" for _ in range(count)]
+    shapes = ["{}+{}×{}", "√{}+{}%", "{}^{}", "({}-{})÷{}", "{}!"]
+    mixed = []
+    for _ in range(count):
+        shape = rng.choice(shapes)
+        mixed.append(shape.format(*[rng.randint(0, 12) for _ in range(shape.count("{}"))]))
+    return [
+        (names[0], lambda: evaluateBatch(same), None),
+        (names[1], lambda: evaluateBatch(same, vectorize=False), None),
+        (names[2], lambda: evaluateBatch(mixed), None),
+    ]
+
+def windowCases(wanted):
+    names = ["CalculatorWindow.process_button_click[=,400ops]", "CalculatorWindow()", "MainWindow()"]
+    if not any(map(wanted, names)):
+        return []
+    from main import QApplication, MainWindow, CalculatorWindow
+    from configstore import config
+    from bench_expression import longExpression
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    cases = []
+
+    if wanted(names[0]):
+        calculator = CalculatorWindow()
+        text = longExpression(400)
+
+        def press_equals():
+            calculator.buffer.setText(text)
+            calculator.process_button_click("=")
+            app.processEvents()
+
+        cases.append((names[0], press_equals, None))
+
+    def construct(cls):
+        window = cls()
+        if cls is MainWindow:
+            # Otherwise every repeat leaves a listener behind on the store.
+            config.unsubscribe(window.config_listener)
+        window.deleteLater()
+        app.processEvents()
+
+    if wanted(names[1]):
+        cases.append((names[1], lambda: construct(CalculatorWindow), None))
+    if wanted(names[2]):
+        cases.append((names[2], lambda: construct(MainWindow), None))
+    return cases
+
+def measure(run, prepare, repeat, warmup):
+    for _ in range(warmup):
+        if prepare:
+            prepare()
+        run()
+    times = []
+    for _ in range(repeat):
+        if prepare:
+            prepare()
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "max_ms": max(times),
+        "repeat": repeat,
+    }
+
+def compare(results, baseline, threshold, overrides):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        allowed = overrides.get(name, threshold)
+        before, after = baseline[name]["median_ms"], result["median_ms"]
+        change = (after - before) / before if before > 0 else 0.0
+        result["baseline_ms"] = before
+        result["change"] = change
+        if change > allowed:
+            regressions.append((name, before, after, change, allowed))
+    return regressions
+
+def parseOverrides(values):
+    overrides = {}
+    for value in values:
+        name, _, limit = value.rpartition("=")
+        if not name:
+            raise SystemExit(f"--threshold-for expects NAME=FRACTION, got {value!r}")
+        overrides[name] = float(limit)
+    return overrides
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmark suite; exits 1 on a regression against --baseline")
+    parser.add_argument("--sizes", default="1,4,12", help="synthetic image sizes in megapixels, e.g. 1,4,12,50")
+    parser.add_argument("--lengths", default="100,1000,5000", help="expression lengths in operators")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("-k", "--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON file from an earlier --output run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed median slowdown as a fraction")
+    parser.add_argument("--threshold-for", action="append", default=[], metavar="NAME=FRACTION", help="per-case threshold")
+    args = parser.parse_args(argv)
+
+    sizes = [float(s) if "." in s else int(s) for s in args.sizes.split(",")]
+    lengths = [int(s) for s in args.lengths.split(",")]
+    overrides = parseOverrides(args.threshold_for)
+
+    # The app resolves config/ and the atlas relative to the working directory.
+    os.chdir(ROOT)
+    results = {}
+    wanted = lambda name: args.filter in name
+    with tempfile.TemporaryDirectory() as fixtures:
+        groups = [
+            lambda: fetchCases(fixtures, sizes, wanted),
+            lambda: convertCases(fixtures, wanted),
+            lambda: svgCases(fixtures, wanted),
+            lambda: expressionCases(lengths, wanted),
+            lambda: batchCases(wanted),
+            lambda: windowCases(wanted),
+        ]
+        for group in groups:
+            for name, run, prepare in group():
+                if not wanted(name):
+                    continue
+                results[name] = measure(run, prepare, args.repeat, args.warmup)
+                print(f"{name:55} {results[name]['median_ms']:10.2f} ms", file=sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            regressions = compare(results, json.load(file)["results"], args.threshold, overrides)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    for name, before, after, change, allowed in regressions:
+        print(f"REGRESSION {name}: {before:.2f} -> {after:.2f} ms (+{change:.0%}, allowed {allowed:.0%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import os
+import json
+import atexit
+import tempfile
+import threading
+import time
+
+CONFIG_FOLDER = "config"
+# Writes are held this long so a burst of changes becomes one write per file.
+WRITE_DELAY = 0.25
+# How often get() is allowed to stat the files for outside edits.
+CHECK_INTERVAL = 1.0
+
+
+class ConfigFile:
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        self.pending = {}
+        self.stamp = None
+        self.loaded = False
+
+    def stat_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        self.loaded = True
+        self.stamp = self.stat_stamp()
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        self.data = data if isinstance(data, dict) else {}
+        # Changes not written yet win over what is on disk.
+        self.data.update(self.pending)
+
+    def write(self):
+        folder = os.path.dirname(self.path) or "."
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(self.data, file, indent=4)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self.pending = {}
+        self.stamp = self.stat_stamp()
+
+
+class ConfigStore:
+    def __init__(self, folder=CONFIG_FOLDER, names=("prefs", "accent", "palette"), write_delay=WRITE_DELAY, check_interval=CHECK_INTERVAL):
+        self.folder = folder
+        self.write_delay = write_delay
+        self.check_interval = check_interval
+        self.lock = threading.RLock()
+        self.files = {name: ConfigFile(os.path.join(folder, name + ".json")) for name in names}
+        self.listeners = []
+        self.timer = None
+        self.last_check = 0.0
+        atexit.register(self.flush)
+
+    def get(self, name, key, default=None):
+        self.check_throttled()
+        with self.lock:
+            return self.files[name].data.get(key, default)
+
+    def snapshot(self, name):
+        self.check_throttled()
+        with self.lock:
+            return dict(self.files[name].data)
+
+    def set(self, name, key, value):
+        self.update(name, {key: value})
+
+    def update(self, name, values):
+        with self.lock:
+            config_file = self.files[name]
+            config_file.data.update(values)
+            config_file.pending.update(values)
+            if self.timer is None:
+                self.timer = threading.Timer(self.write_delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        changed = []
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            for name, config_file in self.files.items():
+                if not config_file.pending:
+                    continue
+                if config_file.stat_stamp() != config_file.stamp:
+                    # Edited behind our back since the last load: merge our
+                    # changes into the newer file instead of clobbering it.
+                    # The load takes the new stamp, so checkForChanges won't
+                    # see this edit; listeners hear about it from here.
+                    before = config_file.data
+                    config_file.load()
+                    if config_file.data != before:
+                        changed.append(name)
+                try:
+                    config_file.write()
+                except OSError as e:
+                    print(f"Could not write {config_file.path}: {e}")
+        self.notify(changed)
+
+    def subscribe(self, callback):
+        # callback(name) runs after a file was reloaded because of an outside
+        # edit; our own writes never trigger it. It is called on whichever
+        # thread noticed the edit, which for flush() is the write timer's, so
+        # a GUI listener should subscribe something that posts to its own
+        # thread, such as a Qt signal's emit.
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def notify(self, changed):
+        for name in changed:
+            for callback in self.listeners:
+                callback(name)
+
+    def check_throttled(self):
+        with self.lock:
+            # Loaded on first use rather than at import, so importing this
+            # module never touches the disk.
+            for config_file in self.files.values():
+                if not config_file.loaded:
+                    config_file.load()
+        now = time.monotonic()
+        if now - self.last_check >= self.check_interval:
+            self.checkForChanges()
+
+    def checkForChanges(self):
+        changed = []
+        with self.lock:
+            self.last_check = time.monotonic()
+            for name, config_file in self.files.items():
+                if config_file.loaded and config_file.stat_stamp() != config_file.stamp:
+                    config_file.load()
+                    changed.append(name)
+        self.notify(changed)
+        return changed
+
+config = ConfigStore()
@@ -0,0 +1,26 @@
+from PySide6.QtCore import QObject, QRunnable, Signal
+from expression import evaluate, formatResult, ExpressionError
+from tracing import span
+
+
+class EvaluationSignals(QObject):
+    finished = Signal(int, str)
+    failed = Signal(int, str)
+
+
+class EvaluationJob(QRunnable):
+    def __init__(self, generation, text):
+        super().__init__()
+        self.generation = generation
+        self.text = text
+        self.signals = EvaluationSignals()
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            with span("evaluation.job", length=len(self.text)):
+                result = formatResult(evaluate(self.text))
+        except ExpressionError as e:
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        self.signals.finished.emit(self.generation, result)
@@ -0,0 +1,119 @@
+SYMBOLS = ("(", ")", "%", "÷", "×", "-", "+", "π", "√", "^", "!")
+DIGITS = "0123456789."
+# Accepted in pasted text only, for scientific notation such as 1.5e+20.
+EXPONENT = "eE"
+# Keyboard and clipboard spellings of the display symbols.
+ALIASES = {"*": "×", "x": "×", "X": "×", "/": "÷", ":": "÷", "p": "π"}
+# After one of these a bracket button opens a new bracket instead of
+# closing the current one.
+OPENS_BRACKET = ("", "(", "%", "÷", "×", "-", "+", "√", "^")
+# What may follow an open bracket; anything may follow a closing one.
+AFTER_OPEN = ("(", "-", "√", "π")
+
+
+class ExpressionBuffer:
+    # The calculator input as a list of single characters, kept apart from
+    # the QLineEdit. A key press appends or pops one element; the joined
+    # string is built at most once per change, when someone asks for it.
+    def __init__(self):
+        self.chars = []
+        self.depth = 0
+        self.revision = 0
+        self._text = ""
+        # button -> handler; everything else is a digit or a symbol.
+        self.actions = {
+            "AC": self.clear,
+            "()": self.bracket,
+            "⌫": self.backspace,
+        }
+
+    def __len__(self):
+        return len(self.chars)
+
+    def text(self):
+        if self._text is None:
+            self._text = "".join(self.chars)
+        return self._text
+
+    @property
+    def last_char(self):
+        return self.chars[-1] if self.chars else ""
+
+    def changed(self):
+        self._text = None
+        self.revision += 1
+
+    def append(self, char):
+        self.chars.append(char)
+        if char == "(":
+            self.depth += 1
+        elif char == ")":
+            self.depth -= 1
+        self.changed()
+
+    def backspace(self):
+        if not self.chars:
+            return
+        char = self.chars.pop()
+        if char == "(":
+            self.depth -= 1
+        elif char == ")":
+            self.depth += 1
+        self.changed()
+
+    def clear(self):
+        self.chars.clear()
+        self.depth = 0
+        self.changed()
+
+    def bracket(self):
+        self.append("(" if self.depth <= 0 or self.last_char in OPENS_BRACKET else ")")
+
+    def follows(self, button):
+        # Two operators in a row are not allowed from the keypad; brackets
+        # are not operators, so "(1+2)×" and "(-" are fine.
+        previous = self.last_char
+        if previous == ")" or previous not in SYMBOLS:
+            return True
+        if previous == "(":
+            return button in AFTER_OPEN
+        return button == "("
+
+    def press(self, button):
+        # One calculator button. Returns False when the press was ignored.
+        action = self.actions.get(button)
+        if action is not None:
+            action()
+            return True
+        if button in SYMBOLS:
+            if not self.follows(button):
+                return False
+            self.append(button)
+            return True
+        if button in DIGITS:
+            self.append(button)
+            return True
+        return False
+
+    def insert(self, text):
+        # Bulk paste: one pass over the text, one change. Characters the
+        # calculator has no button for are dropped, and the keypad's
+        # no-double-symbol rule does not apply, since pasted text is taken
+        # as written.
+        chars = []
+        for char in text:
+            char = ALIASES.get(char, char)
+            if char in DIGITS or char in SYMBOLS or char in EXPONENT:
+                chars.append(char)
+        if not chars:
+            return 0
+        self.chars.extend(chars)
+        self.depth += chars.count("(") - chars.count(")")
+        self.changed()
+        return len(chars)
+
+    def setText(self, text):
+        self.clear()
+        self.chars.extend(text)
+        self.depth = self.chars.count("(") - self.chars.count(")")
+        self._text = text
@@ -0,0 +1,595 @@
+import math
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from tracing import span
+
+# Display symbols and their ASCII spellings map to the same operator.
+BINARY_SYMBOLS = {"+": "+", "-": "-", "×": "*", "*": "*", "÷": "/", "/": "/", "^": "^"}
+DIGITS = "0123456789."
+
+# Exact integers are kept up to this many digits; anything bigger is carried
+# as a logarithm. Python refuses str() past 4300 digits by default, and the
+# cost of exact big-int work grows faster than linearly with digit count.
+EXACT_DIGITS = 3000
+# Results longer than this are shown in scientific notation.
+DISPLAY_DIGITS = 16
+# Significant digits of a mantissa in scientific notation, for exact ints and
+# Approx alike. An Approx only knows log10 to float precision (~15 digits),
+# and the exponent's digits come out of that, so big exponents get fewer.
+MANTISSA_DIGITS = 10
+FLOAT_DIGITS = 15
+# Wall-clock budget for one evaluation, checked between operations.
+TIME_BUDGET = 2.0
+
+# (precedence, right associative)
+BINARY = {
+    "+": (1, False),
+    "-": (1, False),
+    "*": (2, False),
+    "/": (2, False),
+    "mod": (2, False),
+    "^": (4, True),
+}
+PREFIX = {
+    "neg": 3,
+    "pos": 3,
+    "sqrt": 5,
+}
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+def scan(text, position=0):
+    # Yields (kind, value, end) triples from position onwards. kind is one of
+    # "num", "pi", "op", "prefix", "postfix", "(" and ")"; "%" is resolved to
+    # modulo or percent later, once it is known what follows it.
+    length = len(text)
+    while position < length:
+        char = text[position]
+        if char in DIGITS:
+            start = position
+            while position < length and text[position] in DIGITS:
+                position += 1
+            # Scientific notation, as produced by formatResult for big values.
+            if position + 1 < length and text[position] in "eE" and (text[position + 1].isdigit() or (text[position + 1] in "+-" and position + 2 < length and text[position + 2].isdigit())):
+                position += 2
+                while position < length and text[position].isdigit():
+                    position += 1
+            literal = text[start:position]
+            mantissa = literal.split("e")[0].split("E")[0]
+            if mantissa.count(".") > 1 or mantissa == ".":
+                raise ExpressionError(f"Malformed number: {literal}")
+            yield "num", parse_number(literal), position
+            continue
+        position += 1
+        if char in BINARY_SYMBOLS:
+            yield "op", BINARY_SYMBOLS[char], position
+        elif char == "π":
+            yield "pi", math.pi, position
+        elif char == "√":
+            yield "prefix", "sqrt", position
+        elif char == "!":
+            yield "postfix", "fact", position
+        elif char == "%":
+            yield "postfix", "%", position
+        elif char in "()":
+            yield char, char, position
+        elif not char.isspace():
+            raise ExpressionError(f"Unexpected character: {char}")
+
+
+def tokenize(text):
+    for kind, value, _ in scan(text):
+        yield kind, value
+
+
+def parse_number(literal):
+    if "e" not in literal and "E" not in literal:
+        return float(literal) if "." in literal else int(literal)
+    value = float(literal)
+    if math.isinf(value):
+        mantissa, exponent = literal.lower().split("e")
+        return Approx(1, math.log10(float(mantissa)) + int(exponent))
+    return value
+
+
+def starts_operand(kind):
+    return kind in ("num", "pi", "prefix", "(")
+
+
+def compileExpression(text):
+    # Shunting-yard straight to postfix code. Every token is pushed and
+    # popped at most once, so compiling is linear in the input length.
+    tokens = list(tokenize(text))
+    code = []
+    operators = []
+    expect_operand = True
+
+    def pop_while(precedence, right):
+        while operators and operators[-1] != "(":
+            top = operators[-1]
+            top_precedence = PREFIX[top] if top in PREFIX else BINARY[top][0]
+            if top_precedence > precedence or (top_precedence == precedence and not right):
+                code.append(operators.pop())
+            else:
+                break
+
+    for index, (kind, value) in enumerate(tokens):
+        if not expect_operand and starts_operand(kind):
+            # Implicit multiplication: 2π, 3(4+1), 2√9, (1)(2)
+            pop_while(BINARY["*"][0], False)
+            operators.append("*")
+            expect_operand = True
+
+        if kind in ("num", "pi"):
+            code.append(value)
+            expect_operand = False
+        elif kind == "prefix":
+            operators.append(value)
+        elif kind == "(":
+            operators.append("(")
+        elif kind == ")":
+            if expect_operand:
+                raise ExpressionError("Empty brackets or missing operand")
+            while operators and operators[-1] != "(":
+                code.append(operators.pop())
+            if not operators:
+                raise ExpressionError("Unbalanced brackets")
+            operators.pop()
+        elif kind == "postfix":
+            if expect_operand:
+                raise ExpressionError(f"Missing operand before {value}")
+            following = tokens[index + 1][0] if index + 1 < len(tokens) else None
+            if value == "%" and following is not None and starts_operand(following):
+                # a % b is modulo, a trailing % is a percentage.
+                pop_while(BINARY["mod"][0], False)
+                operators.append("mod")
+                expect_operand = True
+            else:
+                code.append("pct" if value == "%" else value)
+        elif kind == "op":
+            if expect_operand:
+                if value in ("-", "+"):
+                    operators.append("neg" if value == "-" else "pos")
+                    continue
+                raise ExpressionError(f"Missing operand before {value}")
+            precedence, right = BINARY[value]
+            pop_while(precedence, right)
+            operators.append(value)
+            expect_operand = True
+
+    if expect_operand:
+        raise ExpressionError("Incomplete expression")
+    while operators:
+        operator = operators.pop()
+        if operator == "(":
+            # An unclosed bracket is closed at the end, like most calculators.
+            continue
+        code.append(operator)
+    return tuple(code)
+
+
+class Approx:
+    # A number too large to keep exactly: sign * 10 ** log10. Only magnitude
+    # survives, which is all a calculator display can show at that size.
+    __slots__ = ("sign", "log10")
+
+    def __init__(self, sign, log10):
+        self.sign = sign
+        self.log10 = log10
+
+    def __neg__(self):
+        return Approx(-self.sign, self.log10)
+
+    def __repr__(self):
+        return f"Approx({self.sign}, {self.log10})"
+
+
+def is_integral(value):
+    return isinstance(value, int) or (isinstance(value, float) and value.is_integer())
+
+
+def digits(value):
+    # Decimal digits of an int, from its bit length; never calls str().
+    return int(value.bit_length() * 0.30102999566398120) + 1
+
+
+def lift(value):
+    if isinstance(value, Approx):
+        return value
+    if value == 0:
+        return Approx(0, -math.inf)
+    return Approx(1 if value > 0 else -1, math.log10(abs(value)))
+
+
+def settle(value):
+    # Approx values that fit a float again become plain floats, and exact
+    # ints past the digit budget become Approx.
+    if isinstance(value, Approx):
+        if value.sign == 0:
+            return 0
+        if value.log10 < 300:
+            return value.sign * 10 ** value.log10
+        return value
+    if isinstance(value, int) and digits(value) > EXACT_DIGITS:
+        return lift(value)
+    if isinstance(value, float) and math.isinf(value):
+        raise OverflowError("float overflow")
+    return value
+
+
+def approx_add(a, b):
+    a, b = lift(a), lift(b)
+    if a.sign == 0:
+        return b
+    if b.sign == 0:
+        return a
+    if a.log10 < b.log10:
+        a, b = b, a
+    ratio = 10 ** (b.log10 - a.log10)
+    if a.sign == b.sign:
+        return Approx(a.sign, a.log10 + math.log10(1 + ratio))
+    if ratio >= 1:
+        return Approx(0, -math.inf)
+    return Approx(a.sign, a.log10 + math.log10(1 - ratio))
+
+
+def exact_or_approx(exact, approx, *operands):
+    if any(isinstance(value, Approx) for value in operands):
+        return settle(approx(*operands))
+    try:
+        return settle(exact(*operands))
+    except OverflowError:
+        return settle(approx(*operands))
+
+
+def add(a, b):
+    return exact_or_approx(lambda a, b: a + b, approx_add, a, b)
+
+
+def subtract(a, b):
+    return exact_or_approx(lambda a, b: a - b, lambda a, b: approx_add(a, -lift(b)), a, b)
+
+
+def multiply(a, b):
+    def approx(a, b):
+        a, b = lift(a), lift(b)
+        return Approx(a.sign * b.sign, a.log10 + b.log10)
+    return exact_or_approx(lambda a, b: a * b, approx, a, b)
+
+
+def divide(a, b):
+    if (isinstance(b, Approx) and b.sign == 0) or b == 0:
+        raise ExpressionError("Division by zero")
+    def approx(a, b):
+        a, b = lift(a), lift(b)
+        return Approx(a.sign * b.sign, a.log10 - b.log10)
+    return exact_or_approx(lambda a, b: a / b, approx, a, b)
+
+
+def modulo(a, b):
+    if isinstance(a, Approx) or isinstance(b, Approx):
+        raise ExpressionError("Number too large for modulo")
+    if b == 0:
+        raise ExpressionError("Division by zero")
+    return a % b
+
+
+def power(base, exponent):
+    if isinstance(exponent, Approx):
+        if exponent.sign == 0:
+            return 1
+        base_magnitude = lift(base)
+        if base_magnitude.sign == 0 or base_magnitude.log10 == 0:
+            return settle(base) if exponent.sign > 0 or base_magnitude.sign != 0 else 1
+        raise ExpressionError("Result too large")
+
+    magnitude = lift(base)
+    if magnitude.sign < 0 and not is_integral(exponent):
+        raise ExpressionError("Result is not a real number")
+    if magnitude.sign == 0:
+        if exponent < 0:
+            raise ExpressionError("Division by zero")
+        return 0 if exponent > 0 else 1
+    sign = -1 if magnitude.sign < 0 and int(exponent) % 2 else 1
+    # Size the result before computing it: 9^9^9 has ~370 million digits.
+    result_log10 = magnitude.log10 * exponent
+    if isinstance(base, Approx) or result_log10 > EXACT_DIGITS:
+        return settle(Approx(sign, result_log10))
+    try:
+        return settle(base ** exponent)
+    except OverflowError:
+        return settle(Approx(sign, result_log10))
+
+
+def factorial(value):
+    if isinstance(value, Approx):
+        raise ExpressionError("Number too large for factorial")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ExpressionError("Factorial needs a whole number")
+        value = int(value)
+    if value < 0:
+        raise ExpressionError("Factorial needs a non-negative number")
+    # lgamma(n + 1) = ln(n!) is Stirling's series evaluated to full float
+    # precision, so the size check costs O(1) whatever n is.
+    result_log10 = math.lgamma(value + 1) / math.log(10)
+    if result_log10 > EXACT_DIGITS:
+        return Approx(1, result_log10)
+    return math.factorial(value)
+
+
+def square_root(value):
+    if isinstance(value, Approx):
+        if value.sign < 0:
+            raise ExpressionError("Square root of a negative number")
+        return settle(Approx(value.sign, value.log10 / 2))
+    if value < 0:
+        raise ExpressionError("Square root of a negative number")
+    if isinstance(value, int) and digits(value) > 300:
+        return settle(Approx(1, math.log10(value) / 2))
+    return math.sqrt(value)
+
+
+def negate(value):
+    return -value
+
+
+BINARY_FUNCTIONS = {
+    "+": add,
+    "-": subtract,
+    "*": multiply,
+    "/": divide,
+    "mod": modulo,
+    "^": power,
+}
+UNARY_FUNCTIONS = {
+    "neg": negate,
+    "pos": lambda a: a,
+    "sqrt": square_root,
+    "fact": factorial,
+    "pct": lambda a: divide(a, 100),
+}
+
+
+def run(code, deadline=None):
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    for index, op in enumerate(code):
+        if op in BINARY_FUNCTIONS:
+            b = pop()
+            push(BINARY_FUNCTIONS[op](pop(), b))
+        elif op in UNARY_FUNCTIONS:
+            push(UNARY_FUNCTIONS[op](pop()))
+        else:
+            push(op)
+        if deadline is not None and index & 255 == 255 and time.monotonic() > deadline:
+            raise ExpressionError("Calculation took too long")
+    return stack[-1]
+
+
+def needsWorker(code):
+    # Only these operators can cost more than a few microseconds: their
+    # exact result size depends on the operand values, not the input length.
+    return "fact" in code or "^" in code
+
+
+@lru_cache(maxsize=256)
+def compiled(text):
+    return compileExpression(text)
+
+
+def evaluate(text, time_budget=TIME_BUDGET):
+    deadline = time.monotonic() + time_budget if time_budget else None
+    try:
+        with span("expression.compile", length=len(text)):
+            code = compiled(text)
+        with span("expression.run", steps=len(code)):
+            return run(code, deadline)
+    except ExpressionError:
+        raise
+    except (OverflowError, ValueError, ZeroDivisionError) as e:
+        raise ExpressionError(str(e)) from e
+
+
+def scientific(sign, lead, exponent, places):
+    # lead is the mantissa rounded to `places` significant digits, as an int.
+    if lead >= 10 ** places:
+        lead, exponent = lead // 10, exponent + 1
+    text = str(lead)
+    mantissa = (text[0] + "." + text[1:]).rstrip("0").rstrip(".")
+    return f"{sign}{mantissa}e{exponent:+d}"
+
+
+def mantissa_places(exponent):
+    return min(MANTISSA_DIGITS, FLOAT_DIGITS - len(str(abs(exponent))))
+
+
+def formatResult(value, max_digits=DISPLAY_DIGITS):
+    if isinstance(value, Approx):
+        if value.sign == 0:
+            return "0"
+        sign = "-" if value.sign < 0 else ""
+        exponent = math.floor(value.log10)
+        places = mantissa_places(exponent)
+        if places < 1:
+            # Past ~1e15 the exponent itself is no longer a whole number in
+            # float, so only its magnitude is shown, as a power of ten.
+            return f"{sign}10^{value.log10:.{MANTISSA_DIGITS}g}"
+        lead = round(10 ** (value.log10 - exponent + places - 1))
+        return scientific(sign, lead, exponent, places)
+    if isinstance(value, int) and digits(value) > max_digits:
+        text = str(abs(value))
+        if len(text) > max_digits:
+            sign = "-" if value < 0 else ""
+            exponent = len(text) - 1
+            places = mantissa_places(exponent)
+            lead = int(text[:places]) + (text[places] >= "5")
+            return scientific(sign, lead, exponent, places)
+    return str(value)
+
+
+# Incremental evaluation for the live preview. It follows the same grammar as
+# compileExpression, but reduces operators to values as soon as precedence
+# allows and keeps its stacks as linked (head, rest) pairs. The state after
+# every token is therefore an O(1) snapshot, and an edit only re-reads the
+# tokens after the first changed character.
+
+def precedence_of(op):
+    return PREFIX[op] if op in PREFIX else BINARY[op][0]
+
+
+def reduce_top(values, op):
+    if op in BINARY_FUNCTIONS:
+        b, (a, rest) = values[0], values[1]
+        return BINARY_FUNCTIONS[op](a, b), rest
+    return UNARY_FUNCTIONS[op](values[0]), values[1]
+
+
+def reduce_while(values, operators, precedence, right):
+    while operators is not None and operators[0] != "(":
+        top = operators[0]
+        top_precedence = precedence_of(top)
+        if top_precedence > precedence or (top_precedence == precedence and not right):
+            values = reduce_top(values, top)
+            operators = operators[1]
+        else:
+            break
+    return values, operators
+
+
+# (values, operators, expect_operand, pending_percent)
+INITIAL_STATE = (None, None, True, False)
+
+
+def step(state, kind, value):
+    values, operators, expect_operand, pending_percent = state
+
+    if pending_percent:
+        if starts_operand(kind):
+            values, operators = reduce_while(values, operators, BINARY["mod"][0], False)
+            operators = ("mod", operators)
+            expect_operand = True
+        else:
+            values = reduce_top(values, "pct")
+        pending_percent = False
+
+    if not expect_operand and starts_operand(kind):
+        values, operators = reduce_while(values, operators, BINARY["*"][0], False)
+        operators = ("*", operators)
+        expect_operand = True
+
+    if kind in ("num", "pi"):
+        values = (value, values)
+        expect_operand = False
+    elif kind == "prefix":
+        operators = (value, operators)
+    elif kind == "(":
+        operators = ("(", operators)
+    elif kind == ")":
+        if expect_operand:
+            raise ExpressionError("Empty brackets or missing operand")
+        values, operators = reduce_while(values, operators, -1, False)
+        if operators is None:
+            raise ExpressionError("Unbalanced brackets")
+        operators = operators[1]
+    elif kind == "postfix":
+        if expect_operand:
+            raise ExpressionError(f"Missing operand before {value}")
+        if value == "%":
+            pending_percent = True
+        else:
+            values = reduce_top(values, value)
+    elif kind == "op":
+        if expect_operand:
+            if value not in ("-", "+"):
+                raise ExpressionError(f"Missing operand before {value}")
+            operators = ("neg" if value == "-" else "pos", operators)
+        else:
+            values, operators = reduce_while(values, operators, *BINARY[value])
+            operators = (value, operators)
+            expect_operand = True
+
+    return values, operators, expect_operand, pending_percent
+
+
+def finish(state):
+    values, operators, expect_operand, pending_percent = state
+    if expect_operand:
+        raise ExpressionError("Incomplete expression")
+    if pending_percent:
+        values = reduce_top(values, "pct")
+    while operators is not None:
+        if operators[0] != "(":
+            values = reduce_top(values, operators[0])
+        operators = operators[1]
+    return values[0]
+
+
+def common_prefix_length(a, b):
+    if b.startswith(a):
+        return len(a)
+    if a.startswith(b):
+        return len(b)
+    length = min(len(a), len(b))
+    index = 0
+    while index < length and a[index] == b[index]:
+        index += 1
+    return index
+
+
+class IncrementalEvaluator:
+    def __init__(self):
+        self.text = ""
+        self.ends = []
+        self.states = [INITIAL_STATE]
+        self.scanner = iter(())
+        self.result = None
+
+    def update(self, text):
+        # Returns the value of text, or None while it is incomplete or invalid.
+        self.start(text)
+        return self.advance()[1]
+
+    def start(self, text):
+        common = common_prefix_length(self.text, text)
+        # The token that ends right at the first changed character may still
+        # grow ("12" -> "123"), so it is re-read along with everything after.
+        # States past a slice that never finished are simply not there yet.
+        keep = bisect_left(self.ends, common)
+        # A number is read with a look past its end for an exponent, so the
+        # last kept one can still grow ("1.5" -> "1.5e+2") even when the
+        # characters after it are unchanged so far; it is re-read too.
+        if keep and self.text[self.ends[keep - 1] - 1] in DIGITS:
+            keep -= 1
+        del self.ends[keep:]
+        del self.states[keep + 1:]
+        self.text = text
+        self.scanner = scan(text, self.ends[-1] if self.ends else 0)
+        self.result = None
+
+    def advance(self, tokens=None):
+        # Reads at most `tokens` more tokens (all of them when None) and
+        # returns (done, value). A caller with a frame budget can stop
+        # between slices and start() again on newer text; nothing read so
+        # far is lost.
+        if self.result is not None:
+            return self.result
+        state = self.states[-1]
+        count = 0
+        try:
+            for kind, value, end in self.scanner:
+                state = step(state, kind, value)
+                self.ends.append(end)
+                self.states.append(state)
+                count += 1
+                if tokens is not None and count >= tokens:
+                    return False, None
+            self.result = (True, finish(state))
+        except (ExpressionError, OverflowError, ValueError, ZeroDivisionError):
+            self.result = (True, None)
+        return self.result
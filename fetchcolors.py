@@ -1,36 +1,199 @@
 from PIL import Image
-import json
-from materialyoucolor.quantize import QuantizeCelebi
+import io
+import math
+import numpy as np
 from materialyoucolor.score.score import Score
+from palettecache import palette_cache, PaletteResult
+from theme import accentVariants
+from configstore import config
+from tracing import span
+from quantizers import quantize, quantizeHistogram, ColorHistogram, QUANTIZERS, DEFAULT_QUANTIZER
+
+MAX_COLORS = 512
+
+# Pixel budget per quality mode; None keeps every pixel. Measured on one
+# core, cold palette cache, wall time and accent (the top scored seed):
+#
+#                         exact/celebi       fast/celebi       fast/wu
+#   image0.png  1.25 MP   1000 ms #A3785B    202 ms #BB9073    160 ms #AA7D5E
+#   image (3)   0.9 MP    2226 ms #D45D11    325 ms #D86116    162 ms #D86015
+#   Control-V   PNG       443 ms  #3A2912    412 ms #3A2912    140 ms #B19674
+#   24 MP JPEG            -                  834 ms            157 ms
+#
+# There is no useful bound on the accent: downsampling moves cluster
+# populations by a fraction of a percent, but when two clusters score
+# within that of each other the other one becomes the seed (Control-V
+# above). Use "exact" when the accent has to match.
+QUALITY_BUDGETS = {
+    "fast": 256 * 256,
+    "balanced": 512 * 512,
+    "exact": None,
+    "max": None,
+}
+# Quality modes that pick their own quantizer over prefs "quantizer". In
+# "fast", Celebi still takes 0.2-0.8 s on the reduced image, while the
+# NumPy Wu backend costs about 100 ms whatever the image, since it works on
+# the fixed-size histogram.
+QUALITY_QUANTIZERS = {
+    "fast": "wu",
+}
+
+# With prefs "streaming" on, the image is binned strip by strip into a
+# fixed-size histogram instead of being turned into one big pixel buffer.
+# It is off by default: it does not bound memory (see streamHistogram), and
+# Celebi and Pillow only see a resampled histogram that way.
+STRIP_PIXELS = 1 << 20
 
 def int_to_hex(color_int):
     rgb_color = color_int & 0xFFFFFF
     return f'#{rgb_color:06X}'
 
-def fetchColor(path, setting, writeToJson):
-    image = Image.open(path)
-    pixel_len = image.width * image.height
-    image_data = image.getdata()
+def hasAlpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+def pixelArray(image, keep_transparent=True):
+    # One contiguous (N, 3) uint8 buffer straight from Pillow's raster, in the
+    # same row-major order getdata() yields. Pixels that are not fully opaque
+    # are left out, as in Material's reference quantizer, so a transparent
+    # area doesn't count as colour; an image with no opaque pixel at all
+    # keeps them unless keep_transparent is False.
+    if hasAlpha(image):
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        rgba = np.asarray(image, dtype=np.uint8).reshape(-1, 4)
+        opaque = rgba[:, 3] == 255
+        if opaque.all() or (keep_transparent and not opaque.any()):
+            return np.ascontiguousarray(rgba[:, :3])
+        return rgba[opaque, :3]
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image, dtype=np.uint8).reshape(-1, 3)
+
+def reduceForQuality(image, setting):
+    if setting not in QUALITY_BUDGETS:
+        raise ValueError(f"Unknown quality setting: {setting}")
+    budget = QUALITY_BUDGETS[setting]
+    if budget is None:
+        return image
+
+    width, height = image.size
+    factor = math.sqrt(width * height / budget)
+    if factor <= 1:
+        return image
+
+    # JPEG can scale by 1/2, 1/4 or 1/8 inside the DCT decoder, so most of
+    # the reduction happens before full-size pixels are ever produced.
+    # draft() picks the smallest scale that is still >= the requested size.
+    image.draft('RGB', (math.ceil(width / factor), math.ceil(height / factor)))
+    width, height = image.size
+    factor = int(math.sqrt(width * height / budget))
+    if factor > 1:
+        mode = 'RGBA' if hasAlpha(image) else 'RGB'
+        if image.mode != mode:
+            image = image.convert(mode)
+        image = image.reduce(factor)
+    return image
+
+def useStreaming(streaming):
+    if streaming is None:
+        streaming = config.get("prefs", "streaming", False)
+    return bool(streaming)
+
+def streamHistogram(image, strip_pixels=STRIP_PIXELS):
+    # Pillow decodes PNG, WebP and JPEG as a whole (crop() loads the full
+    # image first), so peak memory still grows with the image: the decoded
+    # raster, 1-4 bytes per pixel, is held in full. What this saves is the
+    # whole-image RGB copy and the quantizer's input on top of it; only one
+    # strip is converted and binned at a time.
+    width, height = image.size
+    rows = max(1, strip_pixels // max(1, width))
+    histogram = ColorHistogram()
+    for top in range(0, height, rows):
+        strip = image.crop((0, top, width, min(height, top + rows)))
+        histogram.add(pixelArray(strip, keep_transparent=False))
+    if histogram.pixels == 0:
+        # Nothing opaque anywhere: fall back to every pixel, as pixelArray does.
+        for top in range(0, height, rows):
+            histogram.add(pixelArray(image.crop((0, top, width, min(height, top + rows)))))
+    return histogram
+
+def resolveQuantizer(quantizer, setting=None):
+    quantizer = QUALITY_QUANTIZERS.get(setting) or quantizer or config.get("prefs", "quantizer", DEFAULT_QUANTIZER)
+    if quantizer not in QUANTIZERS:
+        raise ValueError(f"Unknown quantizer: {quantizer}")
+    return quantizer
+
+def extractPalette(path, setting, quantizer=None, streaming=None):
+    quantizer = resolveQuantizer(quantizer, setting)
+    with span("fetch.read", path=path):
+        with open(path, 'rb') as file:
+            image_bytes = file.read()
+
+    if setting not in QUALITY_BUDGETS:
+        raise ValueError(f"Unknown quality setting: {setting}")
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # Only the header has been read at this point.
+        streamed = useStreaming(streaming)
+
+        with span("fetch.cache_lookup"):
+            cache_key = palette_cache.key(image_bytes, {"quantizer": quantizer, "max_colors": MAX_COLORS, "budget": QUALITY_BUDGETS[setting], "streaming": streamed, "opaque_only": True})
+            cached = palette_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        with span("fetch.decode", setting=setting) as decode_span:
+            image = reduceForQuality(image, setting)
+            image.load()
+            decode_span.set(size=list(image.size))
+        del image_bytes
+
+        if streamed:
+            with span("fetch.histogram"):
+                histogram = streamHistogram(image)
+        else:
+            with span("fetch.pixels"):
+                pixel_array = pixelArray(image)
 
-    quality = 1
-    pixel_array = [image_data[_] for _ in range(0, pixel_len, quality)]
+    if streamed:
+        with span("fetch.quantize", pixels=histogram.pixels, quantizer=quantizer, streaming=True):
+            result = quantizeHistogram(histogram, MAX_COLORS, quantizer)
+        del histogram
+    else:
+        with span("fetch.quantize", pixels=len(pixel_array), quantizer=quantizer):
+            result = quantize(pixel_array, MAX_COLORS, quantizer)
+        del pixel_array
 
-    result = QuantizeCelebi(pixel_array, 512)
+    palette = buildPalette(result)
 
-    hex_result = {int_to_hex(color): count for color, count in result.items()}
+    with span("fetch.cache_store"):
+        palette_cache.put(cache_key, palette)
 
-    hex_scored = Score.score(result)
-    
-    hex_value_max = max(hex_result, key=hex_result.get)
+    return palette
 
-    with open("config/accent.json", 'r') as file:
-            accent = json.load(file)
+def buildPalette(result):
+    # Scoring, the accents and the dominant colour all come out of the one
+    # quantized histogram.
+    with span("fetch.score", colors=len(result)):
+        scored = Score.score(result)
+    accents = accentVariants(scored[0])
+    accents["dominant"] = int_to_hex(max(result, key=result.get))
+    return PaletteResult(result, scored, accents)
 
-    accent['accent_color_fetched'] = hex_value_max
+def fetchColor(path, setting, writeToJson, quantizer=None):
+    with span("fetchColor", setting=setting):
+        palette = extractPalette(path, setting, quantizer)
 
-    with open("config/accent.json", 'w') as file:
-        json.dump(accent, file, indent=4)
+        if writeToJson:
+            with span("fetch.save_accent"):
+                savePalette(palette)
+                # May be running in a worker process that never reaches atexit.
+                config.flush()
 
+    return palette
 
-    return hex_value_max
-        
\ No newline at end of file
+def savePalette(palette):
+    # The histogram stays in the palette cache; settings only need the seeds
+    # and accents.
+    config.update("palette", palette.toEntry(histogram=False))
+    config.set("accent", "accent_color_fetched", palette.accent)
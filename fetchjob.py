@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from PySide6.QtCore import QObject, QRunnable, Signal
+from tracing import span
+
+_process_pool = None
+
+def process_pool():
+    # Quantization is CPU bound and the C++ quantizer holds the GIL, so it
+    # runs in a separate process and the GUI thread keeps its interpreter.
+    # "spawn" avoids forking a process that already runs Qt threads.
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = multiprocessing.get_context("spawn").Pool(processes=1)
+    return _process_pool
+
+def archiveImage(file_path, custom_directory="fetch_img"):
+    try:
+        os.makedirs(custom_directory, exist_ok=True)
+        destination_path = os.path.join(custom_directory, os.path.basename(file_path))
+        if os.path.abspath(destination_path) == os.path.abspath(file_path):
+            return
+        # Copied under a temporary name and renamed into place: this runs on
+        # a daemon thread that dies at exit, and the prefetch watcher reads
+        # fetch_img/, so a half-copied image must never carry the real name.
+        fd, tmp_path = tempfile.mkstemp(dir=custom_directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as destination, open(file_path, "rb") as source:
+                shutil.copyfileobj(source, destination)
+            # mkstemp creates the file 0600; keep the source's permissions.
+            shutil.copymode(file_path, tmp_path)
+            os.replace(tmp_path, destination_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        print(f"Copied to: {destination_path}")
+    except OSError as e:
+        print(f"Could not archive {file_path}: {e}")
+
+def pool_workers(pool):
+    # The processes that can pick up a task submitted now. Pool replaces a
+    # worker that dies, but the task it was running is lost and its result
+    # never becomes ready.
+    return list(pool._pool)
+
+def dead_worker(workers):
+    for worker in workers:
+        if worker.exitcode is not None:
+            return worker
+    return None
+
+def terminate_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.terminate()
+        _process_pool = None
+
+
+class FetchCancelled(Exception):
+    pass
+
+
+# Progress value for a stage whose length isn't known: the quantizer runs in
+# another process and reports nothing until it is done.
+BUSY = -1
+
+
+class FetchSignals(QObject):
+    progress = Signal(int, str)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+
+class FetchJob(QRunnable):
+    def __init__(self, file_path, custom_directory="fetch_img", setting="max", archive=True, quantizer=None):
+        super().__init__()
+        self.file_path = file_path
+        self.custom_directory = custom_directory
+        self.setting = setting
+        self.quantizer = quantizer
+        self.archive = archive
+        self.signals = FetchSignals()
+        self.cancel_event = threading.Event()
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise FetchCancelled()
+
+    def run(self):
+        try:
+            # The selected file is decoded straight from memory in the worker;
+            # keeping a copy in fetch_img/ is bookkeeping and never delays the
+            # fetch.
+            if self.archive:
+                threading.Thread(target=archiveImage, args=(self.file_path, self.custom_directory), daemon=True).start()
+
+            # Imported here, on the pool thread, so PIL, numpy and the
+            # quantizer stay out of startup; the call is pickled by reference.
+            from fetchcolors import fetchColor
+            self.signals.progress.emit(BUSY, "Quantizing colors")
+            with span("fetch.job", setting=self.setting):
+                pool = process_pool()
+                workers = pool_workers(pool)
+                pending = pool.apply_async(fetchColor, (self.file_path, self.setting, False, self.quantizer))
+                while not pending.ready():
+                    pending.wait(0.1)
+                    if self.cancel_event.is_set():
+                        # Killing the worker is the only way to stop the
+                        # quantizer mid-run; the pool is recreated on the next
+                        # fetch.
+                        terminate_process_pool()
+                        raise FetchCancelled()
+                    dead = dead_worker(workers)
+                    if dead is not None and not pending.ready():
+                        # Out of memory or a crash in the decoder.
+                        terminate_process_pool()
+                        raise RuntimeError(f"The color worker stopped unexpectedly (exit code {dead.exitcode})")
+                palette = pending.get()
+
+            self.check_cancelled()
+            self.signals.progress.emit(100, "Done")
+            self.signals.finished.emit(palette)
+        except FetchCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+
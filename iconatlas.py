@@ -0,0 +1,70 @@
+import os
+import json
+from PySide6.QtGui import QIcon, QPixmap, QGuiApplication
+from PySide6.QtCore import QRect
+
+ATLAS_FOLDER = os.path.join("cache", "assets")
+
+_atlas = None
+_index = None
+# Every tile and icon handed out so far. QPixmap and QIcon are implicitly
+# shared, so all windows hold the same pixel data; nothing is dropped until
+# the atlas itself is re-rendered.
+_pixmaps = {}
+_icons = {}
+
+def load_atlas(folder=ATLAS_FOLDER):
+    global _atlas, _index
+    if _atlas is None:
+        try:
+            with open(os.path.join(folder, "icons.json"), "r") as file:
+                index = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Not rendered yet (first start); callers get empty icons until
+            # the atlas is built and reloadAtlas() is called.
+            return None, None
+        # One decode for every icon at every scale.
+        _atlas = QPixmap(os.path.join(folder, "icons.png"))
+        _index = index
+    return _atlas, _index
+
+def reloadAtlas():
+    global _atlas, _index
+    _atlas = None
+    _index = None
+    _pixmaps.clear()
+    _icons.clear()
+
+def atlasPixmap(name, scale):
+    pixmap = _pixmaps.get((name, scale))
+    if pixmap is not None:
+        return pixmap
+    atlas, index = load_atlas()
+    if index is None or name not in index["icons"]:
+        return QPixmap()
+    x, y, w, h = index["icons"][name]["rects"][str(scale)]
+    pixmap = atlas.copy(QRect(x, y, w, h))
+    pixmap.setDevicePixelRatio(scale)
+    _pixmaps[(name, scale)] = pixmap
+    return pixmap
+
+def atlasIcon(name):
+    icon = _icons.get(name)
+    if icon is not None:
+        return icon
+    _, index = load_atlas()
+    icon = QIcon()
+    if index is None:
+        return icon
+    for scale in index["scales"]:
+        icon.addPixmap(atlasPixmap(name, scale))
+    _icons[name] = icon
+    return icon
+
+def screenScale():
+    # Nearest pre-rendered scale for the primary screen.
+    _, index = load_atlas()
+    if index is None:
+        return 1
+    ratio = QGuiApplication.primaryScreen().devicePixelRatio() if QGuiApplication.primaryScreen() else 1
+    return min(index["scales"], key=lambda scale: abs(scale - ratio))
@@ -1,53 +1,155 @@
 from PIL import Image
 import os
+import json
 import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from tracing import span, traced
 
-def convertImage():
-    
-    def convert_to_jpg(image_path, output_path):
-        image = Image.open(image_path)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
 
+def isImage(image_path):
+    return image_path.lower().endswith(IMAGE_EXTENSIONS)
+
+def listImages(folder_path, recursive=False):
+    if recursive:
+        for root, _, filenames in os.walk(folder_path):
+            for filename in sorted(filenames):
+                if isImage(filename):
+                    yield os.path.join(root, filename)
+        return
+    for filename in sorted(os.listdir(folder_path)):
+        image_path = os.path.join(folder_path, filename)
+        if isImage(filename) and not os.path.isdir(image_path):
+            yield image_path
+
+MANIFEST_PATH = os.path.join('cache', 'imgconv_manifest.json')
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def write_atomic(path, write):
+    # Write next to the destination and rename over it, so a crash or a
+    # concurrent reader never sees a half-written file.
+    folder = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            write(file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+def convert_to_jpg(image_path, output_path):
+    with Image.open(image_path) as image:
         rgb_image = image.convert('RGB')
-        rgb_image.save(output_path, 'JPEG')
-
-    def is_jpg(image_path):
-        return image_path.lower().endswith('.jpg') or image_path.lower().endswith('.jpeg')
-
-    def convert_images_in_folder(input_folder_path, output_folder_path, jpg_folder_path):
-        if not os.path.exists(output_folder_path):
-            os.makedirs(output_folder_path)
-        if not os.path.exists(jpg_folder_path):
-            os.makedirs(jpg_folder_path)
-
-        if not os.path.exists(input_folder_path):
-            print(f"Input folder '{input_folder_path}' does not exist.")
-            return
-
-        for filename in os.listdir(input_folder_path):
-            input_image_path = os.path.join(input_folder_path, filename)
-            
-            if os.path.isdir(input_image_path):
-                continue  
-
-            base_filename = os.path.splitext(filename)[0]
-            if not is_jpg(input_image_path):
-                output_image_path = os.path.join(output_folder_path, base_filename + '.jpg')
-                try:
-                    convert_to_jpg(input_image_path, output_image_path)
-                    print(f"Converted {filename} to JPG and saved as {output_image_path}")
-                except PermissionError as e:
-                    print(f"Permission error: {e}")
-            else:
-                new_jpg_path = os.path.join(jpg_folder_path, filename)
-                try:
-                    shutil.move(input_image_path, new_jpg_path)
-                    print(f"Moved {filename} to {new_jpg_path}")
-                except PermissionError as e:
-                    print(f"Permission error: {e}")
-
-    input_folder_path = 'cache/imgconv'
-    output_folder_path = 'fetch_img'
-    jpg_folder_path = 'fetch_img'
-    os.rmdir('fetch_img')
-    os.mkdir('fetch_img')
-    convert_images_in_folder(input_folder_path, output_folder_path, jpg_folder_path)
+    write_atomic(output_path, lambda file: rgb_image.save(file, 'JPEG'))
+
+def is_jpg(image_path):
+    return image_path.lower().endswith('.jpg') or image_path.lower().endswith('.jpeg')
+
+@traced("convertImage")
+def convertImage(input_folder_path='cache/imgconv', output_folder_path='fetch_img', manifest_path=MANIFEST_PATH, workers=None):
+    if not os.path.exists(output_folder_path):
+        os.makedirs(output_folder_path)
+
+    if not os.path.exists(input_folder_path):
+        print(f"Input folder '{input_folder_path}' does not exist.")
+        return
+
+    manifest = read_manifest(manifest_path)
+    changed = False
+    seen = set()
+    pending = []
+
+    for filename in os.listdir(input_folder_path):
+        input_image_path = os.path.join(input_folder_path, filename)
+
+        if os.path.isdir(input_image_path):
+            continue
+
+        if is_jpg(input_image_path):
+            new_jpg_path = os.path.join(output_folder_path, filename)
+            try:
+                shutil.move(input_image_path, new_jpg_path)
+                print(f"Moved {filename} to {new_jpg_path}")
+            except OSError as e:
+                print(f"Could not move {filename}: {e}")
+            continue
+
+        base_filename = os.path.splitext(filename)[0]
+        output_image_path = os.path.join(output_folder_path, base_filename + '.jpg')
+        stat = os.stat(input_image_path)
+        seen.add(input_image_path)
+
+        entry = manifest.get(input_image_path)
+        if entry and os.path.exists(entry['output']) and entry['output'] == output_image_path:
+            if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                continue
+            # Touched but not changed: only the hash tells.
+            with span("imgconv.hash", file=filename):
+                content_hash = file_hash(input_image_path)
+            if content_hash == entry['hash']:
+                entry['size'], entry['mtime'] = stat.st_size, stat.st_mtime
+                changed = True
+                continue
+
+        pending.append((filename, input_image_path, output_image_path, stat))
+
+    def convert(task):
+        filename, input_image_path, output_image_path, stat = task
+        # One unreadable or corrupt file (UnidentifiedImageError is an
+        # OSError) is logged and skipped; the rest of the run and the
+        # manifest write still happen.
+        try:
+            with span("imgconv.convert", file=filename):
+                convert_to_jpg(input_image_path, output_image_path)
+            print(f"Converted {filename} to JPG and saved as {output_image_path}")
+            with span("imgconv.hash", file=filename):
+                content_hash = file_hash(input_image_path)
+        except (OSError, Image.DecompressionBombError) as e:
+            print(f"Could not convert {filename}: {e}")
+            return None
+        return input_image_path, {
+            'output': output_image_path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': content_hash,
+        }
+
+    if pending:
+        # Pillow releases the GIL while decoding and encoding, so threads are
+        # enough to keep every core busy.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for converted in pool.map(convert, pending):
+                if converted is not None:
+                    manifest[converted[0]] = converted[1]
+                    changed = True
+
+    for source in list(manifest):
+        if source not in seen:
+            del manifest[source]
+            changed = True
+
+    if not changed:
+        return
+
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    with span("imgconv.manifest_write", entries=len(manifest)):
+        write_atomic(manifest_path, lambda file: file.write(json.dumps(manifest, indent=4).encode('utf-8')))
@@ -1,59 +1,43 @@
 import sys
-import math
-import keyboard
-import webbrowser
-import json
-import os
-import shutil
-from colorsys import rgb_to_hls, hls_to_rgb
 from PySide6 import QtWidgets, QtGui, QtCore
-from PySide6.QtWidgets import QMainWindow, QApplication, QLabel, QToolBar, QStatusBar, QCheckBox, QVBoxLayout, QDialogButtonBox, QDialog, QGridLayout, QRadioButton, QWidget, QGroupBox, QPushButton, QLineEdit, QFileDialog
-from PySide6.QtGui import QAction, QIcon, QKeySequence, QPixmap, QFont
-from PySide6.QtCore import Qt, QSize, QPropertyAnimation, QRect, QEasingCurve
-from imgconv import convertImage
-from fetchcolors import fetchColor
-from modifysvg import modifySvg
-
-def read_prefs(file_path):
-    try:
-        with open(file_path, "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return {}
-    except json.JSONDecodeError:
-        return {}
-
-def write_prefs(file_path, prefs):
-    with open(file_path, "w") as file:
-        json.dump(prefs, file, indent=4)
-
-
-def adjust_color(hexcolor, factor):
-    if isinstance(hexcolor, tuple):
-        hexcolor = ''.join(f'{c:02x}' for c in hexcolor)
-    hexcolor = hexcolor.lstrip('#')
-    
-    if len(hexcolor) != 6:  
-        return '#000000'  
-    
-    rgb = tuple(int(hexcolor[i:i+2], 16) for i in range(0, 6, 2))
-    adjusted_rgb = tuple(min(255, max(0, int(c * factor))) for c in rgb)
-    
-    return f"#{adjusted_rgb[0]:02x}{adjusted_rgb[1]:02x}{adjusted_rgb[2]:02x}"
-
-
-def invert_color(hexcolor):
-    if isinstance(hexcolor, tuple):
-        hexcolor = ''.join(f'{c:02x}' for c in hexcolor)
-    hexcolor = hexcolor.lstrip('#')
-    
-    if len(hexcolor) != 6:  
-        return '#ffffff'  
-
-    rgb = tuple(int(hexcolor[i:i+2], 16) for i in range(0, 6, 2))
-    inverted_rgb = tuple(255 - c for c in rgb)
-
-    return f"#{inverted_rgb[0]:02x}{inverted_rgb[1]:02x}{inverted_rgb[2]:02x}"
+from PySide6.QtWidgets import QMainWindow, QApplication, QLabel, QToolBar, QStatusBar, QCheckBox, QVBoxLayout, QHBoxLayout, QDialogButtonBox, QDialog, QGridLayout, QRadioButton, QWidget, QGroupBox, QPushButton, QLineEdit, QFileDialog, QProgressBar, QToolButton, QComboBox
+from PySide6.QtGui import QAction, QIcon, QKeySequence, QPixmap, QFont, QColor
+from PySide6.QtCore import Qt, QSize, QPropertyAnimation, QRect, QEasingCurve, QThreadPool, QTimer, Signal
+from fetchjob import FetchJob, terminate_process_pool, BUSY
+from expression import evaluate, compiled, needsWorker, formatResult, ExpressionError, IncrementalEvaluator
+from evaljob import EvaluationJob
+from exprbuffer import ExpressionBuffer, ALIASES
+from iconatlas import atlasIcon, atlasPixmap, screenScale, reloadAtlas
+from theme import themeFor, accentVariants
+from configstore import config
+from tracing import span
+
+# Tokens the preview reads per event-loop tick; a few ms on slow machines.
+PREVIEW_SLICE = 400
+
+def current_theme():
+    return themeFor(config.get("accent", "accent_color_main"), config.get("prefs", "theme"))
+
+def dialog_stylesheet(theme):
+    return (
+        f"QWidget {{ background-color: {theme['surface']}; color: {theme['onSurface']}; }}\n"
+        f"QPushButton {{ background-color: {theme['secondaryContainer']}; color: {theme['onSecondaryContainer']}; border: 1px solid {theme['outlineVariant']}; padding: 4px 12px; }}"
+    )
+
+def applyTheme(theme):
+    # Every open window restyles itself in place; nothing is rebuilt and the
+    # scheme itself comes out of themeFor's cache.
+    for widget in QApplication.topLevelWidgets():
+        if hasattr(widget, "apply_theme"):
+            widget.apply_theme(theme)
+
+def refreshIcons():
+    for widget in QApplication.topLevelWidgets():
+        if hasattr(widget, "refresh_icons"):
+            widget.refresh_icons()
+
+def icon_color(theme):
+    return theme["primary"]
 
 
 class AnimatedButton(QPushButton):
@@ -81,14 +65,40 @@ class CalculatorWindow(QWidget):
         layout.setContentsMargins(10,10,10,10)
         layout.setSpacing(10)
 
+        display_layout = QVBoxLayout()
+        display_layout.setContentsMargins(0, 0, 0, 0)
+        display_layout.setSpacing(0)
+
         self.display = QLineEdit()
         self.display.setFont(QFont("Roboto", 24))
         self.display.setAlignment(Qt.AlignmentFlag.AlignRight)
-        self.display.setFixedHeight(80)
+        self.display.setFixedHeight(56)
         self.display.setReadOnly(True)
-        layout.addWidget(self.display, 0, 0, 1, 4)
-
-        self.bracket_toggle = True
+        display_layout.addWidget(self.display)
+
+        self.preview = QLabel()
+        self.preview.setObjectName("preview")
+        self.preview.setFont(QFont("Roboto", 12))
+        self.preview.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.preview.setFixedHeight(24)
+        display_layout.addWidget(self.preview)
+        layout.addLayout(display_layout, 0, 0, 1, 4)
+
+        # Typing restarts the timer, so a burst of keys or a paste costs one
+        # preview update and a stale one is never left queued.
+        self.preview_evaluator = IncrementalEvaluator()
+        self.preview_run = 0
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(30)
+        self.preview_timer.timeout.connect(self.update_preview)
+        self.display.textChanged.connect(self.preview_timer.start)
+
+        # The expression lives in the buffer; the QLineEdit only mirrors it,
+        # at most once per event-loop tick however many keys or how long a
+        # paste arrived in between.
+        self.buffer = ExpressionBuffer()
+        self.display_pending = False
 
         self.buttons = {
             "AC": (1, 0), "()": (1, 1), "%": (1, 2), "÷": (1, 3),
@@ -99,164 +109,150 @@ class CalculatorWindow(QWidget):
             "0": (6, 0), ".": (6, 1), "⌫": (6, 2), "=": (6, 3),
         }
 
-        prefs = read_prefs("config/prefs.json")
-        theme = prefs.get("theme")
-        accent = read_prefs("config/accent.json") 
-        self.accent_color = accent.get("accent_color_main")
-        color = ""
+        neutral = {"()", "%", "÷", "×", "-", "+"}
+        self.button_tones = {text: "neutral" if text in neutral else "light" for text in self.buttons}
 
-        if theme == "light":
-            color = adjust_color(self.accent_color, 1.2)
-        elif theme == "dark":
-            color = adjust_color(self.accent_color, 0.8)
-        elif theme == "fetched":
-            if accent.get("accent_color_fetched") != "":
-                color = accent.get("accent_color_fetched")
-            
-        textcolor = invert_color(color)
-        self.setStyleSheet(f"background-color: {color}; color: {textcolor};")
-
-        self.light_color = adjust_color(self.accent_color, 1.5)
-        self.dark_color = adjust_color(self.accent_color, 0.7)
-        self.neutral_color = adjust_color(self.accent_color, 1.0)
-
-        self.text_color = invert_color(self.accent_color)
-
-        self.display.setStyleSheet(
-            f"background-color: {self.neutral_color}; color: {self.text_color}; border: 2px solid {self.light_color}; padding: 10px;"
-        )
-
-        self.button_colors = {
-            "AC": self.light_color,
-            "()": self.neutral_color,
-            "%": self.neutral_color,
-            "÷": self.neutral_color,
-            "√": self.light_color,
-            "π": self.light_color,
-            "^": self.light_color,
-            "!": self.light_color,
-            "7": self.light_color,
-            "8": self.light_color,
-            "9": self.light_color,
-            "×": self.neutral_color,
-            "4": self.light_color,
-            "5": self.light_color,
-            "6": self.light_color,
-            "-": self.neutral_color,
-            "1": self.light_color,
-            "2": self.light_color,
-            "3": self.light_color,
-            "+": self.neutral_color,
-            "0": self.light_color,
-            ".": self.light_color,
-            "⌫": self.light_color,
-            "=": self.light_color,
-        }
+        self.apply_theme(current_theme())
 
         self.button_widgets = {}
         for text, (row, col) in self.buttons.items():
             button = AnimatedButton(text)
             button.setFont(QFont("Roboto", 18))
             button.setFixedSize(80, 80)
-            button.setStyleSheet(f"background-color: {self.button_colors[text]}; color: {self.text_color}; border-radius: 40px;")
+            button.setProperty("tone", self.button_tones[text])
             button.pressed.connect(lambda t=text: self.on_button_pressed(t))
-            button.released.connect(lambda t=text: self.on_button_released(t))
             layout.addWidget(button, row, col)
             self.button_widgets[text] = button
         
         self.setLayout(layout)
 
-        self.allowed_symbols = ["(", ")", "%", "÷", "×", "-", "+", "π", "√", "^", "!"]
-        self.last_char = ""
+        self.key_actions = {
+            Qt.Key.Key_Backspace: "⌫",
+            Qt.Key.Key_Enter: "=",
+            Qt.Key.Key_Return: "=",
+            Qt.Key.Key_Equal: "=",
+            Qt.Key.Key_Escape: "AC",
+            Qt.Key.Key_Delete: "AC",
+        }
+        # Bumped on every input so a slow result never overwrites newer input.
+        self.generation = 0
+        self.evaluation_job = None
+
+    def apply_theme(self, theme):
+        self.theme = theme
+        self.setStyleSheet(self.compile_stylesheet(theme))
+
+    def compile_stylesheet(self, theme):
+        # One sheet for the whole window, parsed once. Buttons pick their rule
+        # through the "tone" property and Qt's own :pressed state, so a press
+        # only flips widget state and never re-parses or re-polishes.
+        tones = {
+            "light": (theme["secondaryContainer"], theme["onSecondaryContainer"]),
+            "neutral": (theme["primaryContainer"], theme["onPrimaryContainer"]),
+        }
+        rules = [
+            f"QWidget {{ background-color: {theme['surface']}; color: {theme['onSurface']}; }}",
+            f"QLineEdit {{ background-color: {theme['surfaceContainerHigh']}; color: {theme['onSurface']}; border: 2px solid {theme['outlineVariant']}; padding: 10px; }}",
+            f"QLabel#preview {{ background-color: {theme['surfaceContainerHigh']}; color: {theme['onSurfaceVariant']}; padding: 0px 12px; }}",
+        ]
+        for tone, (background, foreground) in tones.items():
+            rules.append(f'QPushButton[tone="{tone}"] {{ background-color: {background}; color: {foreground}; border-radius: 40px; }}')
+            rules.append(f'QPushButton[tone="{tone}"]:pressed {{ background-color: {theme["primary"]}; color: {theme["onPrimary"]}; border: 2px solid {theme["outline"]}; }}')
+        return "\n".join(rules)
 
     def on_button_pressed(self, button_text):
-        self.button_widgets[button_text].setStyleSheet(
-            f"border-radius: 40px; background-color: {self.light_color}; color: {self.text_color}; border: 2px solid {self.neutral_color};"
-        )
         self.process_button_click(button_text)
-
-    def on_button_released(self, button_text):
-        self.button_widgets[button_text].setStyleSheet(
-            f"border-radius: 40px; background-color: {self.button_colors[button_text]}; color: {self.text_color};"
-        )
         
     def process_button_click(self, button_text):
-
-        if button_text == "AC":
-            self.display.clear()
-            self.last_char = ""
-            self.bracket_toggle = True
-        elif button_text == "()":
-            current_text = self.display.text()
-            if self.bracket_toggle == True:
-                current_text += "("
-                self.bracket_toggle = False
-            elif self.bracket_toggle == False:
-                current_text += ")"
-                self.bracket_toggle = True
-
-            self.display.setText(current_text)
-            
-        
-        elif button_text == "=":
-            try:  
-                expression = self.display.text().replace("÷", "/").replace("×", "*").replace("π", "math.pi").replace("^", "**")
-                while "√" in expression:
-                    index = expression.index("√")
-                    num_start = index + 1
-                    num_end = num_start
-                    while num_end < len(expression) and (expression[num_end].isdigit() or expression[num_end] == "."):
-                        num_end += 1
-                    number = expression[num_start:num_end]
-                    sqrt_result = f"math.sqrt({number})"
-                    expression = expression[:index] + sqrt_result + expression[num_end:]
-                print(expression)
-                if "!" in expression:
-                    expression = self.handle_factorial(expression)
-                result = eval(expression)
-                self.display.setText(str(result))
-                self.last_char = str(result)[-1] if result else ""
-            except Exception as e:
-                self.showAlert(f"Error")
-                self.last_char = ""
-        elif button_text in self.allowed_symbols:
-            if self.last_char in self.allowed_symbols:
-                return  
-            self.display.setText(self.display.text() + button_text)
-            self.last_char = button_text
-        elif button_text == "⌫":
-            text = self.display.text()
-            if text:
-                self.display.setText(text[:-1])
-                self.last_char = text[-2] if len(text) > 1 else ""
-        else:
-            self.display.setText(self.display.text() + button_text)
-            self.last_char = button_text
-
-    def handle_factorial(self, expression):
-        while "!" in expression:
-            index = expression.index("!")
-            num_start = index - 1
-            while num_start >= 0 and (expression[num_start].isdigit() or expression[num_start] == "."):
-                num_start -= 1
-            num_start += 1
-            number = expression[num_start:index]
-            fact_result = str(math.factorial(int(number)))
-            expression = expression[:num_start] + fact_result + expression[index + 1:]
-        return expression
+        self.generation += 1
+
+        if button_text == "=":
+            text = self.buffer.text()
+            with span("calculator.equals", length=len(text)):
+                self.evaluate_display(text)
+        elif self.buffer.press(button_text):
+            self.schedule_display()
+
+    def paste(self, text):
+        self.generation += 1
+        with span("calculator.paste", length=len(text)):
+            if self.buffer.insert(text):
+                self.schedule_display()
+
+    def schedule_display(self):
+        if not self.display_pending:
+            self.display_pending = True
+            QTimer.singleShot(0, self.flush_display)
+
+    def flush_display(self):
+        self.display_pending = False
+        text = self.buffer.text()
+        if self.display.text() != text:
+            self.display.setText(text)
+
+    def evaluate_display(self, text):
+        try:
+            if needsWorker(compiled(text)):
+                # Factorials and powers are size-checked before they run,
+                # but even bounded big-int work stays off the GUI thread.
+                job = EvaluationJob(self.generation, text)
+                job.signals.finished.connect(self.on_evaluation_finished)
+                job.signals.failed.connect(self.on_evaluation_failed)
+                self.evaluation_job = job
+                QThreadPool.globalInstance().start(job)
+                return
+            self.show_result(formatResult(evaluate(text)))
+        except ExpressionError as e:
+            self.showAlert(f"Error")
+
+    def update_preview(self):
+        # Long input is read a slice of tokens per event-loop tick, so a big
+        # paste or an edit near the front never holds up a frame. A newer
+        # update abandons the old run; the evaluator keeps what it has read.
+        self.preview_run += 1
+        self.preview_evaluator.start(self.buffer.text())
+        self.continue_preview(self.preview_run)
+
+    def continue_preview(self, run):
+        if run != self.preview_run:
+            return
+        text = self.preview_evaluator.text
+        with span("calculator.preview", length=len(text)):
+            done, value = self.preview_evaluator.advance(PREVIEW_SLICE)
+        if not done:
+            QTimer.singleShot(0, lambda: self.continue_preview(run))
+            return
+        preview = "" if value is None else formatResult(value)
+        # Nothing to preview while the display already is the result.
+        self.preview.setText("" if preview == text else f"= {preview}")
+
+    def show_result(self, result):
+        self.buffer.setText(result)
+        self.schedule_display()
+
+    def on_evaluation_finished(self, generation, result):
+        if generation == self.generation:
+            self.show_result(result)
+
+    def on_evaluation_failed(self, generation, message):
+        if generation == self.generation:
+            self.showAlert(f"Error")
 
     def simulate_button_press(self, key):
         if key in self.button_widgets:
             self.on_button_pressed(key)
 
     def keyPressEvent(self, event):
-        key = event.key()
-        if key == Qt.Key.Key_Backspace:
-            self.process_button_click("⌫")
-        elif key == Qt.Key.Key_Enter or Qt.Key.Key_Return or Qt.Key.Key_Equal:
-            self.process_button_click("=")
-        elif key in self.allowed_symbols + [str(i) for i in range(10)] + ["."]:
-            self.process_button_click(key)
+        if event.matches(QtGui.QKeySequence.StandardKey.Paste):
+            self.paste(QApplication.clipboard().text())
+            return
+        # Named keys first, then whatever character the key typed.
+        button = self.key_actions.get(event.key())
+        if button is None:
+            text = event.text()
+            button = ALIASES.get(text, text)
+        if button:
+            self.process_button_click(button)
         super().keyPressEvent(event)
 
     def showAlert(self, message):
@@ -268,38 +264,48 @@ class CalculatorWindow(QWidget):
 
 
 class MainWindow(QMainWindow):
+    # Config listeners can be called from the store's write timer thread;
+    # the signal queues them onto the GUI thread.
+    configChanged = Signal(str)
 
     def __init__(self):
         super().__init__()
 
         calc = CalculatorWindow()
         self.setCentralWidget(calc)
-        self.setWindowIcon(QIcon("cache/assets/calc.png"))
         self.setFixedSize(400, 635)
 
         self.setWindowTitle("MatUCalc")
 
-        setimage_icon_path = "cache/assets/setimage.png"
-        settings_icon_path = "cache/assets/settings.png"
-        about_icon_path = "cache/assets/aboutwindow.png"
-        star_icon_path = "cache/assets/star.png"
-
-        file_action = QAction(QIcon(setimage_icon_path), "Fetch Colors From Image", self)
+        file_action = QAction("Fetch Colors From Image", self)
         file_action.setStatusTip("Set A Wallpaper")
         file_action.triggered.connect(self.fetchBackground)
+        self.file_action = file_action
 
-        settings_action = QAction(QIcon(settings_icon_path), "Settings", self)
+        settings_action = QAction("Settings", self)
         settings_action.triggered.connect(self.openSettingsWindow)
 
-        about_action = QAction(QIcon(about_icon_path), "About", self)
+        about_action = QAction("About", self)
         about_action.setStatusTip("About MatUCalc")
         about_action.triggered.connect(self.openAboutWindow)
 
-        star_github = QAction(QIcon(star_icon_path), "Star Us On Github!", self)
+        star_github = QAction("Star Us On Github!", self)
         star_github.setStatusTip("Star Us!")
         star_github.triggered.connect(self.OpenGithub)
 
 
+        # Icons come from the atlas, which may not be built yet; they are
+        # (re)applied once the deferred asset work has run.
+        self.action_icons = {
+            file_action: "setimage",
+            settings_action: "settings",
+            about_action: "aboutwindow",
+            star_github: "star",
+        }
+        self.refresh_icons()
+        self.assets_scheduled = False
+        self.assets_ready = False
+
         menu = self.menuBar()
         file_menu = menu.addMenu("&File")
         edit_menu = menu.addMenu("&Edit")
@@ -310,66 +316,203 @@ class MainWindow(QMainWindow):
         edit_menu.addAction(settings_action)
         about_menu.addAction(star_github)
 
+        self.fetch_job = None
+        self.prefetch = None
+        # Built on first use and kept; applyTheme restyles them while hidden.
+        self.settings_window = None
+        self.about_window = None
+
+        fetch_status = QWidget()
+        fetch_layout = QHBoxLayout()
+        fetch_layout.setContentsMargins(0, 0, 4, 0)
+        self.fetch_progress = QProgressBar()
+        self.fetch_progress.setRange(0, 100)
+        self.fetch_progress.setFixedWidth(120)
+        self.fetch_cancel = QToolButton()
+        self.fetch_cancel.setText("Cancel")
+        self.fetch_cancel.clicked.connect(self.cancelFetch)
+        fetch_layout.addWidget(self.fetch_progress)
+        fetch_layout.addWidget(self.fetch_cancel)
+        fetch_status.setLayout(fetch_layout)
+        fetch_status.setVisible(False)
+        self.fetch_status = fetch_status
+        menu.setCornerWidget(fetch_status, Qt.Corner.TopRightCorner)
+
+        # Reads are served from memory; this only stats config/ so edits made
+        # outside the app still re-theme the open windows.
+        self.config_timer = QTimer(self)
+        self.config_timer.setInterval(1000)
+        self.config_timer.timeout.connect(config.checkForChanges)
+        self.config_timer.start()
+        self.configChanged.connect(self.onConfigChanged)
+        self.config_listener = self.configChanged.emit
+        config.subscribe(self.config_listener)
+
+    def apply_theme(self, theme):
+        self.centralWidget().apply_theme(theme)
+        if self.assets_ready:
+            self.renderIcons(theme)
+
+    def renderIcons(self, theme):
+        # Re-renders (and invalidates the icon registry) only when the icon
+        # colour actually changed; modifySvg keys every tile on its colour.
+        from modifysvg import modifySvg
+        if modifySvg(icon_color(theme)):
+            reloadAtlas()
+            refreshIcons()
+
+    def refresh_icons(self):
+        self.setWindowIcon(atlasIcon("calc"))
+        for action, name in self.action_icons.items():
+            action.setIcon(atlasIcon(name))
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.assets_scheduled:
+            # Queued behind the first frame, so the window is on screen
+            # before cairo is imported or any icon is rendered.
+            self.assets_scheduled = True
+            QTimer.singleShot(0, self.prepareAssets)
+
+    def prepareAssets(self):
+        self.renderIcons(current_theme())
+        self.refresh_icons()
+        self.assets_ready = True
+        self.updatePrefetch()
+
+    def updatePrefetch(self):
+        # Off unless prefs "prefetch" is true; the watcher and its worker
+        # process only exist while it is on.
+        enabled = config.get("prefs", "prefetch", False)
+        if enabled and self.prefetch is None:
+            from prefetch import PrefetchWatcher
+            self.prefetch = PrefetchWatcher()
+        elif not enabled and self.prefetch is not None:
+            self.prefetch.stop()
+            self.prefetch = None
+        if self.prefetch is not None:
+            # Same settings as a fetch from the dialog, so its cache key matches.
+            self.prefetch.configure(
+                config.get("prefs", "fetch_quality", "exact"),
+                config.get("prefs", "quantizer", "celebi"),
+            )
+            self.prefetch.start()
+
+    def onConfigChanged(self, name):
+        applyTheme(current_theme())
+        if name == "prefs" and self.assets_ready:
+            self.updatePrefetch()
+
     def openSettingsWindow(self):
-        settings_win = SettingsWindow()
-        settings_win.exec()
+        if self.settings_window is None:
+            self.settings_window = SettingsWindow(self)
+        else:
+            self.settings_window.load_settings()
+        self.settings_window.exec()
 
     def openAboutWindow(self):
-        about_win = AboutWindow("cache/assets/calc.png")
-        about_win.exec()
+        if self.about_window is None:
+            self.about_window = AboutWindow("calc", self)
+        self.about_window.exec()
 
     def fetchBackground(self, s):
+        if self.fetch_job is not None:
+            return
         file_path, _ = QFileDialog.getOpenFileName(self, "Open File", "", "Image Files (*.png *.jpg *.webp)")
         if file_path:
-            custom_directory = "fetch_img"
-            if not os.path.exists(custom_directory):
-                os.makedirs(custom_directory)
-                
-            base_filename = os.path.basename(file_path)
-            destination_path = os.path.join(custom_directory, base_filename)
-
-            shutil.copy(file_path, destination_path)
             print(f"Selected file: {file_path}")
-            print(f"Copied to: {destination_path}")
 
-            print({destination_path})
-            convertImage()
-            fetchColor(destination_path, "max", True)
+            job = FetchJob(
+                file_path,
+                setting=config.get("prefs", "fetch_quality", "exact"),
+                archive=config.get("prefs", "archive_fetched", True),
+                quantizer=config.get("prefs", "quantizer", "celebi"),
+            )
+            job.signals.progress.connect(self.onFetchProgress)
+            job.signals.finished.connect(self.onFetchFinished)
+            job.signals.failed.connect(self.onFetchFailed)
+            job.signals.cancelled.connect(self.onFetchCancelled)
+            self.fetch_job = job
+
+            if self.prefetch is not None:
+                # The user's fetch gets the CPU to itself.
+                self.prefetch.pause()
+            self.file_action.setEnabled(False)
+            self.fetch_progress.setRange(0, 100)
+            self.fetch_progress.setValue(0)
+            self.fetch_cancel.setEnabled(True)
+            self.fetch_status.setVisible(True)
+            QThreadPool.globalInstance().start(job)
+
+    def cancelFetch(self):
+        if self.fetch_job is not None:
+            self.fetch_cancel.setEnabled(False)
+            self.fetch_job.cancel()
+
+    def onFetchProgress(self, value, stage):
+        if value == BUSY:
+            # An empty range makes Qt draw a busy indicator instead of a
+            # percentage that would sit still for the whole quantization.
+            self.fetch_progress.setRange(0, 0)
+            self.fetch_progress.setFormat(stage)
+            return
+        self.fetch_progress.setRange(0, 100)
+        self.fetch_progress.setValue(value)
+        self.fetch_progress.setFormat(f"{stage} %p%")
+
+    def onFetchFinished(self, palette):
+        # Already imported by the job's thread by now, so this is free.
+        from fetchcolors import savePalette
+        savePalette(palette)
+        print(f"Fetched accent: {palette.accent} (seeds: {', '.join(palette.seeds())})")
+        self.endFetch()
+
+    def onFetchFailed(self, message):
+        self.endFetch()
+        msg = QtWidgets.QMessageBox()
+        msg.setIcon(QtWidgets.QMessageBox.Icon.Warning)
+        msg.setText(f"Could not fetch colors: {message}")
+        msg.setWindowTitle("Info")
+        msg.exec()
+
+    def onFetchCancelled(self):
+        self.endFetch()
+
+    def endFetch(self):
+        if self.prefetch is not None:
+            self.prefetch.resume()
+        self.fetch_job = None
+        self.fetch_status.setVisible(False)
+        self.file_action.setEnabled(True)
+
+    def closeEvent(self, event):
+        if self.fetch_job is not None:
+            self.fetch_job.cancel()
+        if self.prefetch is not None:
+            self.prefetch.stop()
+        QThreadPool.globalInstance().waitForDone()
+        terminate_process_pool()
+        config.unsubscribe(self.config_listener)
+        config.flush()
+        super().closeEvent(event)
 
     def OpenGithub(self, s):
+        import webbrowser
         webbrowser.open('https://trigor.com')
 
 class AboutWindow(QDialog):
-    def __init__(self, image_path, parent=None):
+    def __init__(self, icon_name, parent=None):
         super().__init__(parent)
 
         self.setWindowTitle("About Us")
         self.setFixedSize(250, 375)
-
-        self.setWindowIcon(QIcon("cache/assets/aboutwindow.png"))
-
-        file = read_prefs("config/prefs.json")
-        accent = read_prefs("config/accent.json") 
-        accent_color = accent.get("accent_color_main")
-        theme = file.get("theme")
-        color = ""
-
-        if theme == "light":
-            color = adjust_color(accent_color, 1.2)
-        else:
-            color = adjust_color(accent_color, 0.8)
-
-        textcolor = invert_color(color)
-
-        self.setStyleSheet(f"background-color: rgb{color}; color: rgb{textcolor}")
+        self.icon_name = icon_name
 
         layout = QVBoxLayout()
 
         self.image_label = QLabel(self)
         self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        
-        pixmap = QPixmap(image_path)
-        self.image_label.setPixmap(pixmap)
+        self.refresh_icons()
         
         layout.addWidget(self.image_label)
 
@@ -379,15 +522,10 @@ class AboutWindow(QDialog):
 
         authors_box = QGroupBox("Authors")
         authors_layout = QVBoxLayout()
-        authors_label = QLabel(self)
-        authors_label.setText(
-            f'<a style="color: rgb{textcolor};" href="https://github.com/LinusFreakvalds">Pliskin</a><br>'
-            f'<a style="color: rgb{textcolor};" href="https://github.com/aarengg715">AarenGG</a><br>'
-        )
-        print(textcolor)
-        authors_label.setOpenExternalLinks(True)
-        authors_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        authors_layout.addWidget(authors_label)
+        self.authors_label = QLabel(self)
+        self.authors_label.setOpenExternalLinks(True)
+        self.authors_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        authors_layout.addWidget(self.authors_label)
         authors_box.setLayout(authors_layout)
         layout.addWidget(authors_box)
         
@@ -396,32 +534,28 @@ class AboutWindow(QDialog):
         layout.addWidget(close_button)
 
         self.setLayout(layout)
+        self.apply_theme(current_theme())
+
+    def refresh_icons(self):
+        self.setWindowIcon(atlasIcon("aboutwindow"))
+        self.image_label.setPixmap(atlasPixmap(self.icon_name, screenScale()))
+
+    def apply_theme(self, theme):
+        self.setStyleSheet(dialog_stylesheet(theme))
+        # Link colours live in the rich text itself, not in the stylesheet.
+        link = theme["primary"]
+        self.authors_label.setText(
+            f'<a style="color: {link};" href="https://github.com/LinusFreakvalds">Pliskin</a><br>'
+            f'<a style="color: {link};" href="https://github.com/aarengg715">AarenGG</a><br>'
+        )
 
 class SettingsWindow(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
-        
-        file = read_prefs("config/prefs.json")
-        accent = read_prefs("config/accent.json") 
-        accent_color = accent.get("accent_color_main")
-        theme = file.get("theme")
-        color = ""
-
-        if theme == "light":
-            color = adjust_color(accent_color, 1.2)
-        else:
-            color = adjust_color(accent_color, 0.8)
-
-        textcolor = invert_color(color)
-        self.setStyleSheet(f"background-color: rgb{color}; color: rgb{textcolor}")
-
-        
-
-        
 
         self.setWindowTitle("Settings")
-        self.setFixedSize(200, 180)
-        self.setWindowIcon(QIcon("cache/assets/settings.png"))
+        self.setFixedSize(200, 210)
+        self.refresh_icons()
 
         QBtn = QDialogButtonBox.Ok | QDialogButtonBox.Cancel
 
@@ -433,15 +567,20 @@ class SettingsWindow(QDialog):
         self.label = QLabel("To choose file from which to fetch, click File > Fetch from image")
         self.label.setWordWrap(True)
         self.label.setVisible(False)
+        # Seeds of the last fetch, straight from config/palette.json; picking
+        # another one never re-reads the image.
+        self.seed_box = QComboBox()
+        self.seed_box.setVisible(False)
 
         radio_layout = QVBoxLayout()
         radio_layout.addWidget(self.radio1)
         radio_layout.addWidget(self.radio2)
         radio_layout.addWidget(self.radio3)
+        radio_layout.addWidget(self.seed_box)
         radio_layout.addWidget(self.label)
         group_box.setLayout(radio_layout)
 
-        self.radio3.toggled.connect(self.label.setVisible)
+        self.radio3.toggled.connect(self.on_fetched_toggled)
 
         buttonBox = QDialogButtonBox(QBtn)
         buttonBox.accepted.connect(self.accept)
@@ -451,13 +590,34 @@ class SettingsWindow(QDialog):
         layout.addWidget(group_box)
         layout.addWidget(buttonBox)
         self.setLayout(layout)
+        self.apply_theme(current_theme())
 
         self.load_settings()
 
+    def refresh_icons(self):
+        self.setWindowIcon(atlasIcon("settings"))
+
+    def apply_theme(self, theme):
+        self.setStyleSheet(dialog_stylesheet(theme))
+
+    def on_fetched_toggled(self, checked):
+        has_seeds = self.seed_box.count() > 0
+        self.seed_box.setVisible(checked and has_seeds)
+        self.label.setVisible(checked and not has_seeds)
+
+    def load_seeds(self):
+        self.seed_box.clear()
+        current = config.get("accent", "accent_color_fetched", "").upper()
+        for seed in config.get("palette", "scored", []):
+            swatch = QPixmap(12, 12)
+            swatch.fill(QColor(seed))
+            self.seed_box.addItem(QIcon(swatch), seed)
+            if seed.upper() == current:
+                self.seed_box.setCurrentIndex(self.seed_box.count() - 1)
+
     def load_settings(self):
-        prefs = read_prefs("config/prefs.json")
-        theme = prefs.get("theme")
-        prefs.update()
+        self.load_seeds()
+        theme = config.get("prefs", "theme")
         if theme == "light":
             self.radio1.setChecked(True)
             self.radio2.setChecked(False)
@@ -472,42 +632,39 @@ class SettingsWindow(QDialog):
             self.radio1.setChecked(False)
             self.radio2.setChecked(False)
             self.radio3.setChecked(True)
+        # The dialog is reused, so the seed list may have changed while the
+        # radio stayed checked.
+        self.on_fetched_toggled(self.radio3.isChecked())
 
     def accept(self):
-        with open("config/prefs.json", 'r') as file:
-            prefs = json.load(file)
-        with open("config/accent.json", 'r') as file2:
-            accent = json.load(file2)
-        accentcolor = read_prefs("config/accent.json") 
-
+        # Once an image has been fetched, Light and Dark take the tones
+        # derived from its seed; before that, the configured greys.
+        derived = config.get("palette", "accents", {})
         if self.radio1.isChecked():
-            prefs['theme'] = 'light'
-            accent['accent_color_main'] = "#c8c8c8"
+            theme, accent = 'light', derived.get("light") or config.get("accent", "accent_color_lightmode", "#c8c8c8")
         elif self.radio2.isChecked():
-            prefs['theme'] = 'dark'
-            accent['accent_color_main'] = "#373737"
-        elif self.radio3.isChecked() and accent['accent_color_fetched'] != "":
-            prefs['theme'] = 'fetched'
-            accent['accent_color_main'] = accent["accent_color_fetched"]
-
-        
-        msg = QtWidgets.QMessageBox()
-        msg.setIcon(QtWidgets.QMessageBox.Icon.Information)
-        msg.setText("For theme to start working, you should restart app")
-        msg.setWindowTitle("Info")
-        msg.exec()
+            theme, accent = 'dark', derived.get("dark") or config.get("accent", "accent_color_darkmode", "#373737")
+        elif self.radio3.isChecked() and self.seed_box.count() > 0:
+            theme, accent = 'fetched', self.seed_box.currentText()
+            accents = dict(config.get("palette", "accents", {}), **accentVariants(accent))
+            config.set("palette", "accents", accents)
+            config.set("accent", "accent_color_fetched", accent)
+        elif self.radio3.isChecked() and config.get("accent", "accent_color_fetched", "") != "":
+            theme, accent = 'fetched', config.get("accent", "accent_color_fetched")
+        else:
+            theme, accent = config.get("prefs", "theme"), config.get("accent", "accent_color_main")
 
-        with open("config/prefs.json", 'w') as file:
-            json.dump(prefs, file, indent=4)
-        with open("config/accent.json", 'w') as file2:
-            json.dump(accent, file2, indent=4)
+        # Both files are written together by the store, off the GUI thread.
+        config.set("prefs", "theme", theme)
+        config.set("accent", "accent_color_main", accent)
 
         super().accept()
+        # Takes effect straight away in every open window.
+        applyTheme(themeFor(accent, theme))
     
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
-    modifySvg()
 
     window.show()
     sys.exit(app.exec())
\ No newline at end of file
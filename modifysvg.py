@@ -1,61 +1,297 @@
 import os
+import re
 import json
+import hashlib
 import xml.etree.ElementTree as ET
 import cairo
+from svgpath import normalize, parseTransform, multiply, PathError
+from tracing import span, traced
 
-with open("config/accent.json", "r") as file:
-    accentfile = json.load(file)
+ICON_FILES = ["aboutwindow.svg", "calc.svg", "setimage.svg", "settings.svg", "star.svg"]
+ATLAS_NAME = "icons.png"
+INDEX_NAME = "icons.json"
+BASE_ICON_SIZE = 64
+SCALES = (1, 2, 3)
+ATLAS_WIDTH = 1024
+PADDING = 1
+# Bump when the renderer output changes so stale atlas tiles are redrawn.
+RENDERER_VERSION = 2
+
+SKIPPED_TAGS = {"defs", "namedview", "metadata", "title", "desc", "style", "clipPath", "mask", "symbol", "linearGradient", "radialGradient", "pattern"}
+NAMED_COLORS = {
+    "black": (0, 0, 0), "white": (255, 255, 255), "red": (255, 0, 0),
+    "green": (0, 128, 0), "blue": (0, 0, 255), "gray": (128, 128, 128), "grey": (128, 128, 128),
+}
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def parse_color(value, current_color=None):
+    value = (value or "").strip().lower()
+    if value in ("", "none", "transparent"):
+        return None
+    if value == "currentcolor":
+        return current_color
+    if value in NAMED_COLORS:
+        return NAMED_COLORS[value]
+    if value.startswith('#'):
+        value = value[1:]
+        if len(value) == 3:
+            value = ''.join(c * 2 for c in value)
+        if len(value) == 6:
+            try:
+                return tuple(int(value[i:i + 2], 16) for i in range(0, 6, 2))
+            except ValueError:
+                return None
+    match = re.match(r"rgb\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)", value)
+    if match:
+        return tuple(min(255, int(c)) for c in match.groups())
+    return None
+
+def parse_length(value, default=0.0):
+    if value is None:
+        return default
+    match = re.match(r"\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)", value)
+    return float(match.group(1)) if match else default
+
+def svg_size(root):
+    # Extract width and height, remove 'px' if present
+    width = root.attrib.get('width', '500').replace('px', '')
+    height = root.attrib.get('height', '500').replace('px', '')
+
+    try:
+        width = int(width)
+        height = int(height)
+    except ValueError:
+        width = 500
+        height = 500
+    return width, height
+
+def view_box(root):
+    box = root.attrib.get('viewBox')
+    if box:
+        values = [float(v) for v in re.split(r"[\s,]+", box.strip()) if v]
+        if len(values) == 4 and values[2] > 0 and values[3] > 0:
+            return values
+    width, height = svg_size(root)
+    return [0.0, 0.0, float(width), float(height)]
+
+def element_style(element):
+    style = {}
+    for name in ("fill", "fill-rule", "fill-opacity", "stroke", "stroke-width", "stroke-opacity",
+                 "stroke-linecap", "stroke-linejoin", "opacity", "color", "display", "visibility"):
+        if name in element.attrib:
+            style[name] = element.attrib[name]
+    # style="" overrides presentation attributes
+    for declaration in element.attrib.get('style', '').split(';'):
+        if ':' in declaration:
+            name, value = declaration.split(':', 1)
+            style[name.strip()] = value.strip()
+    return style
+
+def shape_path(element):
+    tag = local_name(element.tag)
+    get = lambda name: parse_length(element.attrib.get(name))
+    if tag == "path":
+        return element.attrib.get('d', '')
+    if tag == "rect":
+        x, y, w, h = get('x'), get('y'), get('width'), get('height')
+        if w <= 0 or h <= 0:
+            return ''
+        rx = parse_length(element.attrib.get('rx', element.attrib.get('ry')))
+        ry = parse_length(element.attrib.get('ry', element.attrib.get('rx')))
+        rx, ry = min(rx, w / 2), min(ry, h / 2)
+        if rx <= 0 or ry <= 0:
+            return f"M{x},{y}h{w}v{h}h{-w}z"
+        return (f"M{x + rx},{y}h{w - 2 * rx}a{rx},{ry} 0 0 1 {rx},{ry}v{h - 2 * ry}"
+                f"a{rx},{ry} 0 0 1 {-rx},{ry}h{2 * rx - w}a{rx},{ry} 0 0 1 {-rx},{-ry}"
+                f"v{2 * ry - h}a{rx},{ry} 0 0 1 {rx},{-ry}z")
+    if tag in ("circle", "ellipse"):
+        cx, cy = get('cx'), get('cy')
+        if tag == "circle":
+            rx = ry = get('r')
+        else:
+            rx, ry = get('rx'), get('ry')
+        if rx <= 0 or ry <= 0:
+            return ''
+        return f"M{cx - rx},{cy}a{rx},{ry} 0 1 0 {2 * rx},0a{rx},{ry} 0 1 0 {-2 * rx},0z"
+    if tag == "line":
+        return f"M{get('x1')},{get('y1')}L{get('x2')},{get('y2')}"
+    if tag in ("polygon", "polyline"):
+        points = element.attrib.get('points', '').strip()
+        if not points:
+            return ''
+        return "M" + points + ("z" if tag == "polygon" else "")
+    return None
+
+def draw_element(context, element, matrix, inherited, ink):
+    tag = local_name(element.tag)
+    if tag in SKIPPED_TAGS:
+        return
+
+    state = dict(inherited)
+    state.update(element_style(element))
+    if state.get("display") == "none":
+        return
+    matrix = multiply(matrix, parseTransform(element.attrib.get('transform')))
+
+    d = shape_path(element)
+    if d is None:
+        for child in element:
+            draw_element(context, child, matrix, state, ink)
+        return
+    if not d or state.get("visibility") == "hidden":
+        return
+
+    context.set_matrix(cairo.Matrix(*matrix))
+    context.new_path()
+    try:
+        for command, args in normalize(d):
+            if command == "M":
+                context.move_to(*args)
+            elif command == "L":
+                context.line_to(*args)
+            elif command == "C":
+                context.curve_to(*args)
+            else:
+                context.close_path()
+    except PathError as e:
+        # Render what parsed, like browsers do with broken path data.
+        print(f"SVG path error: {e}")
+
+    opacity = parse_length(state.get("opacity"), 1.0)
+    current_color = ink(parse_color(state.get("color", "black")))
+    fill = ink(parse_color(state.get("fill", "#000000"), current_color))
+    stroke = ink(parse_color(state.get("stroke"), current_color))
+
+    if fill is not None:
+        context.set_fill_rule(cairo.FILL_RULE_EVEN_ODD if state.get("fill-rule") == "evenodd" else cairo.FILL_RULE_WINDING)
+        alpha = opacity * parse_length(state.get("fill-opacity"), 1.0)
+        context.set_source_rgba(fill[0] / 255, fill[1] / 255, fill[2] / 255, alpha)
+        if stroke is not None:
+            context.fill_preserve()
+        else:
+            context.fill()
+    if stroke is not None:
+        context.set_line_width(parse_length(state.get("stroke-width"), 1.0))
+        context.set_line_cap({"round": cairo.LINE_CAP_ROUND, "square": cairo.LINE_CAP_SQUARE}.get(state.get("stroke-linecap"), cairo.LINE_CAP_BUTT))
+        context.set_line_join({"round": cairo.LINE_JOIN_ROUND, "bevel": cairo.LINE_JOIN_BEVEL}.get(state.get("stroke-linejoin"), cairo.LINE_JOIN_MITER))
+        alpha = opacity * parse_length(state.get("stroke-opacity"), 1.0)
+        context.set_source_rgba(stroke[0] / 255, stroke[1] / 255, stroke[2] / 255, alpha)
+        context.stroke()
+    context.new_path()
+
+def render(root, context, x, y, size, color):
+    # Black is the icons' ink colour and is swapped for the target colour;
+    # anything else keeps its own colour.
+    target = parse_color(color)
+    ink = lambda rgb: target if rgb == (0, 0, 0) and target is not None else rgb
+
+    min_x, min_y, box_width, box_height = view_box(root)
+    scale = min(size / box_width, size / box_height)
+    # preserveAspectRatio="xMidYMid meet"
+    offset_x = x + (size - box_width * scale) / 2 - min_x * scale
+    offset_y = y + (size - box_height * scale) / 2 - min_y * scale
+    base = (scale, 0.0, 0.0, scale, offset_x, offset_y)
+
+    context.save()
+    context.rectangle(x, y, size, size)
+    context.clip()
+    # Presentation attributes on <svg> itself (fill="#000000") are inherited.
+    inherited = element_style(root)
+    for child in root:
+        draw_element(context, child, base, inherited, ink)
+    context.restore()
+
+def pack(sizes, width=ATLAS_WIDTH, padding=PADDING):
+    # Shelf packing, tallest first; good enough for a few dozen square tiles.
+    positions = {}
+    x = y = shelf_height = 0
+    for key, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        if x + size > width and x > 0:
+            x = 0
+            y += shelf_height + padding
+            shelf_height = 0
+        positions[key] = (x, y, size, size)
+        x += size + padding
+        shelf_height = max(shelf_height, size)
+    return positions, y + shelf_height
+
+def render_key(source, color, base_size, scales):
+    digest = hashlib.sha256(source)
+    digest.update(f"{color}|{base_size}|{','.join(map(str, scales))}|{RENDERER_VERSION}".encode("utf-8"))
+    return digest.hexdigest()
+
+def read_index(path):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+@traced("modifySvg")
+def modifySvg(color="#FF0000", files=ICON_FILES, input_folder=None, output_folder=None, base_size=BASE_ICON_SIZE, scales=SCALES):
+    input_folder = input_folder or os.path.join(os.getcwd(), "assets")
+    output_folder = output_folder or os.path.join(os.getcwd(), "cache", "assets")
 
-def modifySvg():
-    input_folder = os.path.join(os.getcwd(), "assets")
-    output_folder = os.path.join(os.getcwd(), "cache", "assets")
-    files = ["aboutwindow.svg", "calc.svg", "setimage.svg", "settings.svg", "star.svg"]
-    
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
+    atlas_path = os.path.join(output_folder, ATLAS_NAME)
+    index_path = os.path.join(output_folder, INDEX_NAME)
+    old_icons = read_index(index_path).get("icons", {}) if os.path.exists(atlas_path) else {}
+
+    names = {file: os.path.splitext(file)[0] for file in files}
+    keys = {}
+    sources = {}
     for file in files:
-        with open(f"assets/{file}", "rt") as fin:
-            data = fin.read()
-            data = data.replace('style="fill:#000000;', f'style="fill:#FF0000;')
-
-        with open(f"assets/{file}", "wt") as fin:
-            fin.write(data)
-
-        tree = ET.parse(f"assets/{file}")
-        root = tree.getroot()
-
-        # Extract width and height, remove 'px' if present
-        width = root.attrib.get('width', '500').replace('px', '')
-        height = root.attrib.get('height', '500').replace('px', '')
-
-        try:
-            width = int(width)
-            height = int(height)
-        except ValueError:
-            width = 500
-            height = 500
-
-        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
-        context = cairo.Context(surface)
-        context.set_source_rgb(1, 1, 1)
-        context.paint()
-
-        for element in root:
-            if element.tag.endswith('path'):
-                path_data = element.attrib.get('d', '')
-                if path_data:
-                    context.new_path()
-                    path_commands = path_data.split()
-                    for command in path_commands:
-                        if command.startswith('M'):
-                            x, y = map(float, command[1:].split(','))
-                            context.move_to(x, y)
-                        elif command.startswith('L'):
-                            x, y = map(float, command[1:].split(','))
-                            context.line_to(x, y)
-                    context.stroke()
-
-        surface.write_to_png(f"cache/assets/{file.replace('.svg', '.png')}")
-
-modifySvg()
+        with open(os.path.join(input_folder, file), "rb") as fin:
+            sources[file] = fin.read()
+        keys[file] = render_key(sources[file], color, base_size, scales)
+
+    if set(old_icons) == set(names.values()) and all(old_icons[names[file]].get("key") == keys[file] for file in files):
+        return []
+
+    sizes = {(names[file], scale): base_size * scale for file in files for scale in scales}
+    positions, height = pack(sizes)
+
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, ATLAS_WIDTH, height)
+    context = cairo.Context(surface)
+    old_atlas = cairo.ImageSurface.create_from_png(atlas_path) if old_icons else None
+
+    icons = {}
+    rendered = []
+    for file in files:
+        name = names[file]
+        rects = {str(scale): list(positions[(name, scale)]) for scale in scales}
+        old = old_icons.get(name)
+        if old is not None and old.get("key") == keys[file]:
+            # Unchanged icon: copy its tiles across from the previous atlas.
+            for scale, (x, y, w, h) in rects.items():
+                old_x, old_y = old["rects"][scale][:2]
+                context.save()
+                context.set_operator(cairo.OPERATOR_SOURCE)
+                context.set_source_surface(old_atlas, x - old_x, y - old_y)
+                context.rectangle(x, y, w, h)
+                context.fill()
+                context.restore()
+        else:
+            # Recoloring happens while drawing; assets/ is never rewritten.
+            with span("svg.render", file=file):
+                root = ET.fromstring(sources[file])
+                for x, y, w, h in rects.values():
+                    render(root, context, x, y, w, color)
+            rendered.append(file)
+        icons[name] = {"key": keys[file], "rects": rects}
+
+    surface.flush()
+    with span("svg.atlas_write", height=height):
+        tmp_path = atlas_path + ".tmp"
+        surface.write_to_png(tmp_path)
+        os.replace(tmp_path, atlas_path)
+
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump({"base_size": base_size, "scales": list(scales), "icons": icons}, file, indent=4)
+    os.replace(tmp_path, index_path)
+    return rendered
@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+class PaletteResult:
+    # Everything one quantization gives: the {argb: population} histogram,
+    # Score's seeds in rank order, and the accents derived from the top seed
+    # ("light", "dark", "fetched", plus the most frequent colour as
+    # "dominant"), as hex. Picklable, so it comes back whole from the fetch
+    # worker.
+    def __init__(self, histogram, scored, accents):
+        self.histogram = histogram
+        self.scored = scored
+        self.accents = accents
+
+    @property
+    def accent(self):
+        return self.accents["fetched"]
+
+    def seeds(self):
+        return [f"#{color & 0xFFFFFF:06X}" for color in self.scored]
+
+    def toEntry(self, histogram=True):
+        entry = {"scored": self.seeds(), "accents": dict(self.accents)}
+        if histogram:
+            entry["histogram"] = {str(color): count for color, count in self.histogram.items()}
+        return entry
+
+    @classmethod
+    def fromEntry(cls, entry):
+        histogram = {int(color): count for color, count in entry.get("histogram", {}).items()}
+        scored = [0xFF000000 | int(color.lstrip("#"), 16) for color in entry["scored"]]
+        return cls(histogram, scored, dict(entry["accents"]))
+
+    def __repr__(self):
+        return f"PaletteResult({self.accent!r}, seeds={self.seeds()})"
+
+
+class PaletteCache:
+    def __init__(self, folder, max_entries=256, max_bytes=32 * 1024 * 1024):
+        self.folder = folder
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    def key(self, image_bytes, settings):
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.folder, key + ".json")
+
+    def get(self, key):
+        path = self.entry_path(key)
+        with self.lock:
+            try:
+                with open(path, "r") as file:
+                    entry = json.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            # mtime doubles as the LRU timestamp
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+        try:
+            return PaletteResult.fromEntry(entry)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            # Written by an older version; recomputed and overwritten.
+            return None
+
+    def put(self, key, palette):
+        entry = palette.toEntry()
+        with self.lock:
+            os.makedirs(self.folder, exist_ok=True)
+            # Write to a temp file in the same folder and rename over the
+            # entry, so concurrent readers (or another process) never see a
+            # half-written file.
+            fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as file:
+                    json.dump(entry, file)
+                os.replace(tmp_path, self.entry_path(key))
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+                raise
+            self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.folder):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        count = len(entries)
+        for _, size, path in entries:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total -= size
+
+    def clear(self):
+        with self.lock:
+            if not os.path.isdir(self.folder):
+                return
+            for name in os.listdir(self.folder):
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except FileNotFoundError:
+                    pass
+
+palette_cache = PaletteCache(os.path.join("cache", "palettes"))
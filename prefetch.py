@@ -0,0 +1,139 @@
+import os
+import threading
+import multiprocessing
+from tracing import span
+
+PREFETCH_FOLDERS = ("fetch_img", os.path.join("cache", "imgconv"))
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+# Seconds between two looks at the folders. A stat per file, no reads.
+POLL_INTERVAL = 5.0
+# Pause after every image, so a folder full of new wallpapers trickles
+# through instead of keeping a core busy.
+IMAGE_DELAY = 1.0
+NICENESS = 10
+
+
+def lower_priority():
+    try:
+        os.nice(NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+def prefetchPalette(path, setting, quantizer):
+    # Runs in the prefetch worker. extractPalette stores the result in the
+    # palette cache, which is all that is wanted here.
+    from fetchcolors import extractPalette
+    with span("prefetch.palette", path=path, setting=setting):
+        return extractPalette(path, setting, quantizer).accent
+
+
+class PrefetchWatcher:
+    # Polls the image folders from a daemon thread and computes palettes for
+    # new or changed images, one at a time, in a niced worker process, so a
+    # later fetch of the same file is a palette cache hit. Polling rather
+    # than inotify keeps it dependency-free and portable; a scan is one
+    # stat per file.
+    def __init__(self, folders=PREFETCH_FOLDERS, poll_interval=POLL_INTERVAL, delay=IMAGE_DELAY):
+        self.folders = folders
+        self.poll_interval = poll_interval
+        self.delay = delay
+        self.settings = ("exact", None)
+        # path -> (mtime_ns, size, setting, quantizer) of the last run
+        self.stamps = {}
+        self.stop_event = threading.Event()
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+        self.thread = None
+        self.pool = None
+
+    def configure(self, setting, quantizer):
+        # Called from the GUI thread; the worker never reads config itself,
+        # since config listeners would then fire on this thread.
+        self.settings = (setting, quantizer)
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="prefetch", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.resume_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def pause(self):
+        # The image in progress finishes; nothing new starts until resume().
+        self.resume_event.clear()
+
+    def resume(self):
+        self.resume_event.set()
+
+    def isPaused(self):
+        return not self.resume_event.is_set()
+
+    def scan(self):
+        found = {}
+        for folder in self.folders:
+            try:
+                entries = os.scandir(folder)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        found[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def pending(self):
+        found = self.scan()
+        # Deleted files are forgotten, so one added back is seen as new.
+        self.stamps = {path: stamp for path, stamp in self.stamps.items() if path in found}
+        settings = self.settings
+        return [(path, stamp + settings) for path, stamp in sorted(found.items())
+                if self.stamps.get(path) != stamp + settings]
+
+    def worker(self):
+        if self.pool is None:
+            self.pool = multiprocessing.get_context("spawn").Pool(processes=1, initializer=lower_priority)
+        return self.pool
+
+    def process(self, path, setting, quantizer):
+        pending = self.worker().apply_async(prefetchPalette, (path, setting, quantizer))
+        while not pending.ready():
+            pending.wait(0.1)
+            if self.stop_event.is_set():
+                return False
+        try:
+            accent = pending.get()
+            print(f"Prefetched palette for {path}: {accent}")
+        except Exception as e:
+            # Not retried until the file changes.
+            print(f"Could not prefetch {path}: {e}")
+        return True
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.resume_event.wait()
+            for path, stamp in self.pending():
+                self.resume_event.wait()
+                if self.stop_event.is_set():
+                    return
+                _, _, setting, quantizer = stamp
+                if not self.process(path, setting, quantizer):
+                    return
+                self.stamps[path] = stamp
+                if self.stop_event.wait(self.delay):
+                    return
+            if self.stop_event.wait(self.poll_interval):
+                return
@@ -0,0 +1,267 @@
+import numpy as np
+from PIL import Image
+from materialyoucolor.quantize import QuantizeCelebi
+
+# Every backend takes an (N, 3) uint8 pixel buffer and returns the same shape
+# of result as QuantizeCelebi, {argb: population}, so Score.score and the
+# palette cache never need to know which one ran.
+DEFAULT_QUANTIZER = "celebi"
+
+BITS = 5
+SIDE = (1 << BITS) + 1
+# Pixels are binned this many at a time so the float copies stay small no
+# matter how large the image is.
+CHUNK_PIXELS = 1 << 20
+# Rows handed to the pixel-only backends (Celebi, Pillow) when they run from
+# a histogram.
+SAMPLE_PIXELS = 1 << 20
+KMEANS_ITERATIONS = 10
+
+
+def to_argb(colors):
+    colors = np.clip(np.rint(colors), 0, 255).astype(np.int64)
+    return (0xFF000000 | (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]).tolist()
+
+def as_result(colors, counts):
+    result = {}
+    for argb, count in zip(to_argb(colors), counts.tolist()):
+        if count > 0:
+            # Two boxes can round to the same 8-bit colour.
+            result[argb] = result.get(argb, 0) + int(count)
+    return result
+
+def celebi_rows(pixels):
+    # The binding only accepts a sequence of [r, g, b] rows. Each distinct
+    # colour becomes one tuple and every pixel a reference to it, so a photo
+    # costs one pointer per pixel rather than one Python list per pixel.
+    # Order is kept, so the quantizer sees exactly the same input.
+    packed = (pixels[:, 0].astype(np.uint32) << 16) | (pixels[:, 1].astype(np.uint32) << 8) | pixels[:, 2]
+    colors, inverse = np.unique(packed, return_inverse=True)
+    rows = np.fromiter(zip((colors >> 16).tolist(), ((colors >> 8) & 0xFF).tolist(), (colors & 0xFF).tolist()),
+                       dtype=object, count=len(colors))
+    return rows[inverse.reshape(-1)].tolist()
+
+def quantizeCelebi(pixels, max_colors):
+    # Wu followed by weighted k-means in Lab, in C++.
+    return QuantizeCelebi(celebi_rows(pixels), max_colors)
+
+class ColorHistogram:
+    # Per 5-bit bin: population, channel sums and sum of squares, with a zero
+    # border at index 0 so cumulative sums need no bounds checks. Fixed size
+    # (about 1.4 MB) however many pixels are added, so an image can be fed
+    # in strip by strip.
+    def __init__(self):
+        self.moments = np.zeros((5, SIDE ** 3), dtype=np.float64)
+        self.pixels = 0
+
+    @classmethod
+    def fromPixels(cls, pixels):
+        histogram = cls()
+        histogram.add(pixels)
+        return histogram
+
+    def add(self, pixels):
+        size = SIDE ** 3
+        for start in range(0, len(pixels), CHUNK_PIXELS):
+            chunk = pixels[start:start + CHUNK_PIXELS]
+            index = (chunk >> (8 - BITS)).astype(np.intp) + 1
+            flat = (index[:, 0] * SIDE + index[:, 1]) * SIDE + index[:, 2]
+            values = chunk.astype(np.float64)
+            self.moments[0] += np.bincount(flat, minlength=size)
+            for channel in range(3):
+                self.moments[1 + channel] += np.bincount(flat, weights=values[:, channel], minlength=size)
+            self.moments[4] += np.bincount(flat, weights=(values * values).sum(axis=1), minlength=size)
+        self.pixels += len(pixels)
+
+    def cumulative(self):
+        return self.moments.reshape(5, SIDE, SIDE, SIDE).cumsum(axis=1).cumsum(axis=2).cumsum(axis=3)
+
+    def occupied(self):
+        # Mean colour and population of every non-empty bin.
+        occupied = self.moments[0] > 0
+        weights = self.moments[0, occupied]
+        return (self.moments[1:4, occupied] / weights).T, weights
+
+    def sample(self, budget=SAMPLE_PIXELS):
+        # A pixel buffer with the same colour proportions, for backends that
+        # only take pixels: each bin's mean colour repeated in proportion to
+        # its population, at most about `budget` rows.
+        points, weights = self.occupied()
+        scale = min(1.0, budget / max(1.0, weights.sum()))
+        repeats = np.maximum(1, np.rint(weights * scale)).astype(np.intp)
+        colors = np.clip(np.rint(points), 0, 255).astype(np.uint8)
+        return np.repeat(colors, repeats, axis=0)
+
+def box_volume(cumulative, box):
+    r0, r1, g0, g1, b0, b1 = box
+    c = cumulative
+    return (c[:, r1, g1, b1] - c[:, r1, g1, b0] - c[:, r1, g0, b1] + c[:, r1, g0, b0]
+            - c[:, r0, g1, b1] + c[:, r0, g1, b0] + c[:, r0, g0, b1] - c[:, r0, g0, b0])
+
+def box_slabs(cumulative, box, axis, positions):
+    # Moments of the box with the given axis cut off at every position,
+    # i.e. the (lo, position] part, for all positions at once.
+    lows, highs = box[0::2], box[1::2]
+    faces = []
+    for corner in ((1, 1), (1, 0), (0, 1), (0, 0)):
+        index = [slice(None)]
+        others = iter(corner)
+        for current in range(3):
+            if current == axis:
+                index.append(positions)
+            else:
+                index.append(highs[current] if next(others) else lows[current])
+        faces.append(cumulative[tuple(index)])
+    return faces[0] - faces[1] - faces[2] + faces[3]
+
+def box_variance(moments):
+    weight = moments[0]
+    if weight <= 0:
+        return 0.0
+    return moments[4] - (moments[1] ** 2 + moments[2] ** 2 + moments[3] ** 2) / weight
+
+def cut_box(cumulative, box):
+    whole = box_volume(cumulative, box)
+    best = None
+    for axis in range(3):
+        lo, hi = box[2 * axis], box[2 * axis + 1]
+        if hi - lo < 2:
+            continue
+        positions = np.arange(lo + 1, hi)
+        lower = box_slabs(cumulative, box, axis, positions) - box_slabs(cumulative, box, axis, np.array([lo]))
+        upper = whole[:, None] - lower
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = ((lower[1:4] ** 2).sum(axis=0) / lower[0]) + ((upper[1:4] ** 2).sum(axis=0) / upper[0])
+        score[(lower[0] <= 0) | (upper[0] <= 0)] = -np.inf
+        choice = int(np.argmax(score))
+        if score[choice] != -np.inf and (best is None or score[choice] > best[0]):
+            best = (score[choice], axis, int(positions[choice]))
+    if best is None:
+        return None
+    _, axis, position = best
+    first, second = list(box), list(box)
+    first[2 * axis + 1] = position
+    second[2 * axis] = position
+    return tuple(first), tuple(second)
+
+def wu_boxes(cumulative, max_colors):
+    boxes = [(0, SIDE - 1, 0, SIDE - 1, 0, SIDE - 1)]
+    variances = [box_variance(box_volume(cumulative, boxes[0]))]
+    while len(boxes) < max_colors:
+        # Split the box that currently hides the most colour variance.
+        index = max(range(len(boxes)), key=variances.__getitem__)
+        if variances[index] <= 0:
+            break
+        halves = cut_box(cumulative, boxes[index])
+        if halves is None:
+            variances[index] = 0.0
+            continue
+        boxes[index] = halves[0]
+        variances[index] = box_variance(box_volume(cumulative, halves[0]))
+        boxes.append(halves[1])
+        variances.append(box_variance(box_volume(cumulative, halves[1])))
+    return boxes
+
+def quantizeWu(pixels, max_colors):
+    return histogramWu(ColorHistogram.fromPixels(pixels), max_colors)
+
+def histogramWu(histogram, max_colors):
+    # Xiaolin Wu's variance-minimising box cuts over a 32x32x32 histogram: a
+    # single pass with no refinement, the first half of what Celebi does.
+    cumulative = histogram.cumulative()
+    volumes = np.array([box_volume(cumulative, box) for box in wu_boxes(cumulative, min(max_colors, 256))])
+    weights = volumes[:, 0]
+    keep = weights > 0
+    return as_result(volumes[keep, 1:4] / weights[keep, None], weights[keep])
+
+def seed_centroids(points, weights, count):
+    # Deterministic k-means++: start from the most populated bin, then keep
+    # taking the bin with the largest population x squared distance to the
+    # seeds so far, so one big cluster can't take every seed.
+    points32 = points.astype(np.float32)
+    weights32 = weights.astype(np.float32)
+
+    def distance_to(index):
+        difference = points32 - points32[index]
+        return np.einsum("ij,ij->i", difference, difference)
+
+    chosen = [int(np.argmax(weights))]
+    nearest = distance_to(chosen[0])
+    for _ in range(count - 1):
+        candidate = int(np.argmax(weights32 * nearest))
+        if nearest[candidate] == 0:
+            break
+        chosen.append(candidate)
+        np.minimum(nearest, distance_to(candidate), out=nearest)
+    return points[chosen].copy()
+
+def nearest_centroid(points, centroids):
+    # |p - c|^2 = |p|^2 - 2 p.c + |c|^2: one float32 matmul instead of a
+    # (points, centroids, 3) difference tensor. |p|^2 is the same for every
+    # centroid, so it doesn't change the argmin and is left out.
+    cross = points @ centroids.T
+    return ((centroids * centroids).sum(axis=1)[None, :] - 2 * cross).argmin(axis=1)
+
+def quantizeKmeans(pixels, max_colors):
+    return histogramKmeans(ColorHistogram.fromPixels(pixels), max_colors)
+
+def histogramKmeans(histogram, max_colors, iterations=KMEANS_ITERATIONS):
+    # Weighted k-means over the occupied 5-bit bins rather than raw pixels:
+    # at most 32768 points however large the image is.
+    points, weights = histogram.occupied()
+    count = min(max_colors, 256, len(points))
+    centroids = seed_centroids(points, weights, count)
+    points32 = points.astype(np.float32)
+    for _ in range(iterations):
+        nearest = nearest_centroid(points32, centroids.astype(np.float32))
+        population = np.bincount(nearest, weights=weights, minlength=len(centroids))
+        sums = np.stack([np.bincount(nearest, weights=weights * points[:, channel], minlength=len(centroids)) for channel in range(3)], axis=1)
+        moved = population > 0
+        updated = centroids.copy()
+        updated[moved] = sums[moved] / population[moved, None]
+        if np.allclose(updated, centroids, atol=0.5):
+            centroids = updated
+            break
+        centroids = updated
+    nearest = nearest_centroid(points32, centroids.astype(np.float32))
+    population = np.bincount(nearest, weights=weights, minlength=len(centroids))
+    return as_result(centroids, population)
+
+def quantizePillow(pixels, max_colors):
+    # libimagequant-free fast octree from Pillow's C core.
+    image = Image.fromarray(pixels.reshape(1, -1, 3), "RGB")
+    quantized = image.quantize(colors=min(max_colors, 256), method=Image.Quantize.FASTOCTREE)
+    palette = quantized.getpalette()
+    colors = quantized.getcolors(maxcolors=256) or []
+    indices = np.array([index for _, index in colors], dtype=np.intp)
+    counts = np.array([count for count, _ in colors], dtype=np.int64)
+    rgb = np.array(palette[:len(palette) // 3 * 3], dtype=np.float64).reshape(-1, 3)
+    return as_result(rgb[indices], counts)
+
+QUANTIZERS = {
+    "celebi": quantizeCelebi,
+    "wu": quantizeWu,
+    "kmeans": quantizeKmeans,
+    "pillow": quantizePillow,
+}
+
+# Wu and k-means read the histogram's moments directly, so they give the
+# same result streamed or not. Celebi and Pillow only get sample(): bin means
+# instead of raw pixels, and at least one row per occupied bin, so rare
+# colours weigh up to the downscale factor more than they should.
+HISTOGRAM_QUANTIZERS = {
+    "celebi": lambda histogram, max_colors: quantizeCelebi(histogram.sample(), max_colors),
+    "wu": histogramWu,
+    "kmeans": histogramKmeans,
+    "pillow": lambda histogram, max_colors: quantizePillow(histogram.sample(), max_colors),
+}
+
+def quantize(pixels, max_colors, backend=DEFAULT_QUANTIZER):
+    if backend not in QUANTIZERS:
+        raise ValueError(f"Unknown quantizer: {backend}")
+    return QUANTIZERS[backend](pixels, max_colors)
+
+def quantizeHistogram(histogram, max_colors, backend=DEFAULT_QUANTIZER):
+    if backend not in HISTOGRAM_QUANTIZERS:
+        raise ValueError(f"Unknown quantizer: {backend}")
+    return HISTOGRAM_QUANTIZERS[backend](histogram, max_colors)
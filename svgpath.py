@@ -0,0 +1,254 @@
+import re
+import math
+
+COMMANDS = "MmLlHhVvCcSsQqTtAaZz"
+ARG_COUNTS = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7, "Z": 0}
+
+_FLAG_RE = re.compile(r"[\s,]*([01])")
+_NUMBER_RE = re.compile(r"[\s,]*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)")
+
+
+class PathError(ValueError):
+    pass
+
+
+def read_numbers(d, position, count):
+    values = []
+    for _ in range(count):
+        match = _NUMBER_RE.match(d, position)
+        if match is None:
+            raise PathError(f"Expected a number at {position}")
+        values.append(float(match.group(1)))
+        position = match.end()
+    return values, position
+
+
+def read_arc(d, position):
+    radii, position = read_numbers(d, position, 3)
+    flags = []
+    for _ in range(2):
+        match = _FLAG_RE.match(d, position)
+        if match is None:
+            raise PathError(f"Expected an arc flag at {position}")
+        flags.append(match.group(1) == "1")
+        position = match.end()
+    end, position = read_numbers(d, position, 2)
+    return radii + flags + end, position
+
+
+def segments(d):
+    # Splits the path into (command, args) pairs, expanding implicit repeats.
+    # A moveto followed by extra pairs continues as lineto.
+    position = 0
+    command = None
+    length = len(d)
+    while True:
+        while position < length and d[position] in " \t\r\n,":
+            position += 1
+        if position >= length:
+            return
+        if d[position] in COMMANDS:
+            command = d[position]
+            position += 1
+            if command in "Zz":
+                yield command, []
+                continue
+        elif command is None or command in "Zz":
+            raise PathError(f"Path data must start with a command: {d[position:position + 10]!r}")
+
+        upper = command.upper()
+        if upper == "A":
+            args, position = read_arc(d, position)
+        else:
+            args, position = read_numbers(d, position, ARG_COUNTS[upper])
+        yield command, args
+        if command == "M":
+            command = "L"
+        elif command == "m":
+            command = "l"
+
+
+def arc_to_cubics(x1, y1, rx, ry, angle, large_arc, sweep, x2, y2):
+    # Endpoint to centre parameterisation (SVG 1.1 implementation notes F.6.5),
+    # then one cubic per quarter turn at most.
+    if (x1, y1) == (x2, y2):
+        return []
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0:
+        return [(x1, y1, x2, y2, x2, y2)]
+
+    phi = math.radians(angle % 360)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = (x1 - x2) / 2, (y1 - y2) / 2
+    x1p = cos_phi * dx + sin_phi * dy
+    y1p = -sin_phi * dx + cos_phi * dy
+
+    scale = (x1p * x1p) / (rx * rx) + (y1p * y1p) / (ry * ry)
+    if scale > 1:
+        scale = math.sqrt(scale)
+        rx, ry = rx * scale, ry * scale
+
+    numerator = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p
+    denominator = rx * rx * y1p * y1p + ry * ry * x1p * x1p
+    factor = math.sqrt(max(0.0, numerator / denominator))
+    if large_arc == sweep:
+        factor = -factor
+    cxp = factor * rx * y1p / ry
+    cyp = -factor * ry * x1p / rx
+    cx = cos_phi * cxp - sin_phi * cyp + (x1 + x2) / 2
+    cy = sin_phi * cxp + cos_phi * cyp + (y1 + y2) / 2
+
+    def vector_angle(ux, uy, vx, vy):
+        return math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+
+    theta1 = vector_angle(1, 0, (x1p - cxp) / rx, (y1p - cyp) / ry)
+    delta = vector_angle((x1p - cxp) / rx, (y1p - cyp) / ry, (-x1p - cxp) / rx, (-y1p - cyp) / ry)
+    if not sweep and delta > 0:
+        delta -= 2 * math.pi
+    elif sweep and delta < 0:
+        delta += 2 * math.pi
+
+    count = max(1, math.ceil(abs(delta) / (math.pi / 2) - 1e-9))
+    step = delta / count
+    handle = 4 / 3 * math.tan(step / 4)
+
+    def point(theta):
+        cos_t, sin_t = math.cos(theta), math.sin(theta)
+        return (cx + rx * cos_t * cos_phi - ry * sin_t * sin_phi,
+                cy + rx * cos_t * sin_phi + ry * sin_t * cos_phi)
+
+    def derivative(theta):
+        cos_t, sin_t = math.cos(theta), math.sin(theta)
+        return (-rx * sin_t * cos_phi - ry * cos_t * sin_phi,
+                -rx * sin_t * sin_phi + ry * cos_t * cos_phi)
+
+    cubics = []
+    theta = theta1
+    start = (x1, y1)
+    for index in range(count):
+        next_theta = theta + step
+        end = (x2, y2) if index == count - 1 else point(next_theta)
+        d1 = derivative(theta)
+        d2 = derivative(next_theta)
+        cubics.append((
+            start[0] + handle * d1[0], start[1] + handle * d1[1],
+            end[0] - handle * d2[0], end[1] - handle * d2[1],
+            end[0], end[1],
+        ))
+        start = end
+        theta = next_theta
+    return cubics
+
+
+def normalize(d):
+    # Resolves every command to absolute M/L/C/Z so a renderer only needs
+    # move_to, line_to, curve_to and close_path.
+    x = y = 0.0
+    start_x = start_y = 0.0
+    last_control = None
+    last_quad = None
+    for command, args in segments(d):
+        upper = command.upper()
+        relative = command != upper
+        ox, oy = (x, y) if relative else (0.0, 0.0)
+        control = None
+        quad = None
+
+        if upper == "M":
+            x, y = args[0] + ox, args[1] + oy
+            start_x, start_y = x, y
+            yield "M", (x, y)
+        elif upper == "L":
+            x, y = args[0] + ox, args[1] + oy
+            yield "L", (x, y)
+        elif upper == "H":
+            x = args[0] + ox
+            yield "L", (x, y)
+        elif upper == "V":
+            y = args[0] + oy
+            yield "L", (x, y)
+        elif upper == "C":
+            x1, y1 = args[0] + ox, args[1] + oy
+            x2, y2 = args[2] + ox, args[3] + oy
+            x, y = args[4] + ox, args[5] + oy
+            control = (x2, y2)
+            yield "C", (x1, y1, x2, y2, x, y)
+        elif upper == "S":
+            if last_control is not None:
+                x1, y1 = 2 * x - last_control[0], 2 * y - last_control[1]
+            else:
+                x1, y1 = x, y
+            x2, y2 = args[0] + ox, args[1] + oy
+            x, y = args[2] + ox, args[3] + oy
+            control = (x2, y2)
+            yield "C", (x1, y1, x2, y2, x, y)
+        elif upper in "QT":
+            if upper == "Q":
+                qx, qy = args[0] + ox, args[1] + oy
+                end_x, end_y = args[2] + ox, args[3] + oy
+            else:
+                if last_quad is not None:
+                    qx, qy = 2 * x - last_quad[0], 2 * y - last_quad[1]
+                else:
+                    qx, qy = x, y
+                end_x, end_y = args[0] + ox, args[1] + oy
+            # Quadratic to cubic: control points sit 2/3 of the way to q.
+            yield "C", (x + 2 / 3 * (qx - x), y + 2 / 3 * (qy - y),
+                        end_x + 2 / 3 * (qx - end_x), end_y + 2 / 3 * (qy - end_y),
+                        end_x, end_y)
+            x, y = end_x, end_y
+            quad = (qx, qy)
+        elif upper == "A":
+            rx, ry, angle, large_arc, sweep = args[:5]
+            end_x, end_y = args[5] + ox, args[6] + oy
+            for cubic in arc_to_cubics(x, y, rx, ry, angle, large_arc, sweep, end_x, end_y):
+                yield "C", cubic
+            x, y = end_x, end_y
+        elif upper == "Z":
+            x, y = start_x, start_y
+            yield "Z", ()
+
+        last_control = control
+        last_quad = quad
+
+
+def parseTransform(text):
+    # Returns an affine matrix (xx, yx, xy, yy, x0, y0) in cairo order.
+    matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+    for name, raw in re.findall(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)", text or ""):
+        values = [float(v) for v in re.findall(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?", raw)]
+        if name == "matrix" and len(values) == 6:
+            step = tuple(values)
+        elif name == "translate" and values:
+            step = (1.0, 0.0, 0.0, 1.0, values[0], values[1] if len(values) > 1 else 0.0)
+        elif name == "scale" and values:
+            step = (values[0], 0.0, 0.0, values[1] if len(values) > 1 else values[0], 0.0, 0.0)
+        elif name == "rotate" and values:
+            angle = math.radians(values[0])
+            cos_a, sin_a = math.cos(angle), math.sin(angle)
+            step = (cos_a, sin_a, -sin_a, cos_a, 0.0, 0.0)
+            if len(values) == 3:
+                cx, cy = values[1], values[2]
+                step = multiply((1.0, 0.0, 0.0, 1.0, cx, cy), multiply(step, (1.0, 0.0, 0.0, 1.0, -cx, -cy)))
+        elif name == "skewX" and values:
+            step = (1.0, 0.0, math.tan(math.radians(values[0])), 1.0, 0.0, 0.0)
+        elif name == "skewY" and values:
+            step = (1.0, math.tan(math.radians(values[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            raise PathError(f"Malformed transform: {name}({raw})")
+        matrix = multiply(matrix, step)
+    return matrix
+
+
+def multiply(m, n):
+    # m applied after n, i.e. the SVG "m n" transform list order.
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (
+        a * a2 + c * b2,
+        b * a2 + d * b2,
+        a * c2 + c * d2,
+        b * c2 + d * d2,
+        a * e2 + c * f2 + e,
+        b * e2 + d * f2 + f,
+    )
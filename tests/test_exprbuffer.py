@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exprbuffer import ExpressionBuffer
+
+
+def pressed(*buttons):
+    buffer = ExpressionBuffer()
+    for button in buttons:
+        buffer.press(button)
+    return buffer.text()
+
+
+def test_operator_after_closing_bracket():
+    assert pressed("()", "1", "+", "2", "()", "×", "3") == "(1+2)×3"
+    assert pressed("()", "4", "()", "!") == "(4)!"
+
+
+def test_prefix_after_open_bracket():
+    assert pressed("()", "-", "5") == "(-5"
+    assert pressed("()", "√", "9") == "(√9"
+    assert pressed("()", "π") == "(π"
+
+
+def test_binary_operator_after_open_bracket_is_ignored():
+    assert pressed("()", "×", "2") == "(2"
+
+
+def test_two_operators_in_a_row_are_ignored():
+    assert pressed("1", "+", "×", "2") == "1+2"
+    assert pressed("1", "+", "()", "2", "()") == "1+(2)"
+
+
+def test_backspace_and_paste():
+    buffer = ExpressionBuffer()
+    assert buffer.insert("2*(3+4)/7") == 9
+    assert buffer.text() == "2×(3+4)÷7"
+    buffer.backspace()
+    buffer.backspace()
+    assert buffer.text() == "2×(3+4)"
+    buffer.press("()")
+    assert buffer.text() == "2×(3+4)("
@@ -0,0 +1,122 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from expression import evaluate, formatResult, Approx, ExpressionError, IncrementalEvaluator
+from batcheval import evaluateBatch
+
+CORPUS = [
+    "2+3×4", "(2+3)×4", "2^3^2", "-2^2", "2π", "3(4+1)", "2√9", "√16+1",
+    "5!", "3!^2", "-(3)!", "50%", "10%3", "7÷2", "8÷2", "0.1+0.2", "1.5e+3",
+    "2^0.5", "4^-1", "(1)(2)", "((1+2)", "100000!", "9^9^9", "10^(10^300)",
+    "1÷0", "5%0", "√-4", "(-8)^0.5", "2×", "1.2.3", "()", "",
+]
+
+
+def outcome(text):
+    try:
+        return repr(evaluate(text))
+    except ExpressionError:
+        return None
+
+
+def test_precedence():
+    assert evaluate("2+3×4") == 14
+    assert evaluate("(2+3)×4") == 20
+    assert evaluate("2^3^2") == 512
+    assert evaluate("-2^2") == -4
+    assert evaluate("10-4-3") == 3
+
+
+def test_implicit_multiplication():
+    assert evaluate("3(4+1)") == 15
+    assert evaluate("(1)(2)") == 2
+    assert evaluate("2√9") == 6.0
+    assert evaluate("2π") == evaluate("2×π")
+
+
+def test_root_factorial_power_and_percent():
+    assert evaluate("√16+1") == 5.0
+    assert evaluate("5!") == 120
+    assert evaluate("3!^2") == 36
+    assert evaluate("4^-1") == 0.25
+    assert evaluate("50%") == 0.5
+    assert evaluate("10%3") == 1
+
+
+def test_ints_stay_exact():
+    assert evaluate("8÷2") == 4.0 and isinstance(evaluate("8÷2"), float)
+    assert evaluate("2^100") == 2 ** 100
+
+
+def test_huge_results_are_approximate():
+    value = evaluate("100000!")
+    assert isinstance(value, Approx)
+    assert formatResult(value).endswith("e+456573")
+    assert isinstance(evaluate("9^9^9"), Approx)
+
+
+@pytest.mark.parametrize("text", ["1÷0", "5%0", "0^-1", "√-4", "(-8)^0.5", "2×", "1.2.3", "()"])
+def test_errors(text):
+    with pytest.raises(ExpressionError):
+        evaluate(text)
+
+
+def test_incremental_matches_evaluate():
+    evaluator = IncrementalEvaluator()
+    for text in CORPUS:
+        value = evaluator.update(text)
+        assert (None if value is None else repr(value)) == outcome(text), text
+
+
+@pytest.mark.parametrize("edits", [
+    ["1.5e+20", "1.5e+2", "1.5e+", "1.5e+2"],
+    ["99^99", "3.697296376e+197", "3.697296376e+19", "3.697296376e+1", "3.697296376e+17"],
+    ["2e", "2e5", "2e", "2e-", "2e-3", "2e-3×4"],
+    ["12", "123", "12", "12+", "12+3", "1", "1.", "1.5", "1.5E3"],
+    ["(1+2", "(1+2)", "(1+2)!", "(1+2)", "(1+2)%", "(1+2)%4"],
+])
+def test_incremental_edits_match_evaluate(edits):
+    evaluator = IncrementalEvaluator()
+    for text in edits:
+        value = evaluator.update(text)
+        assert (None if value is None else repr(value)) == outcome(text), text
+
+
+def test_incremental_slices_match_evaluate():
+    evaluator = IncrementalEvaluator()
+    for text in ["1+2×3-4", "1+2×3-4e", "1+2×3-4e2", "1+2", "1+2×3-4e2^2"]:
+        evaluator.start(text)
+        done, value = evaluator.advance(2)
+        while not done:
+            done, value = evaluator.advance(2)
+        assert (None if value is None else repr(value)) == outcome(text), text
+
+
+def test_batch_matches_evaluate():
+    # Enough rows per shape that the vectorized path runs too.
+    texts = CORPUS + [f"{a}+{b}×{a}" for a in range(-3, 9) for b in ("0", "2.5", "7", "1e3")]
+    texts += [f"{a}÷{b}-{a}%" for a in range(12) for b in range(-2, 3)]
+    for text, (value, error) in zip(texts, evaluateBatch(texts)):
+        expected = outcome(text)
+        if expected is None:
+            assert value is None and error, text
+        else:
+            assert repr(value) == expected and error is None, text
+
+
+def test_scientific_format_is_the_same_for_ints_and_approx():
+    assert formatResult(evaluate("99^99")) == "3.697296376e+197"
+    assert formatResult(evaluate("10^2999")) == "1e+2999"
+    assert formatResult(evaluate("10^3001")) == "1e+3001"
+    assert formatResult(evaluate("1000!")) == "4.023872601e+2567"
+    assert formatResult(evaluate("3000!")) == "4.149359603e+9130"
+    assert formatResult(evaluate("99999999999999999")) == "1e+17"
+
+
+def test_exponent_past_float_precision():
+    assert formatResult(evaluate("10^(10^300)")) == "10^1e+300"
+    assert formatResult(evaluate("-(10^(10^300))")) == "-10^1e+300"
+    assert formatResult(evaluate(formatResult(evaluate("10^(10^300)")))) == "10^1e+300"
@@ -0,0 +1,80 @@
+from functools import lru_cache
+from materialyoucolor.hct import Hct
+from materialyoucolor.scheme.scheme_tonal_spot import SchemeTonalSpot
+from materialyoucolor.dynamiccolor.material_dynamic_colors import MaterialDynamicColors
+
+THEMES = ("light", "dark", "fetched")
+DEFAULT_THEME = "light"
+DEFAULT_ACCENT = "#E2B895"
+# Tones of the light and dark accents derived from a fetched seed; the same
+# lightness as the built-in #c8c8c8 and #373737.
+LIGHT_ACCENT_TONE = 80
+DARK_ACCENT_TONE = 23
+
+# Only the roles the windows actually paint with are resolved; each one is a
+# full contrast solve in materialyoucolor, so the rest would be wasted work.
+ROLES = (
+    "background", "onBackground",
+    "surface", "onSurface", "surfaceVariant", "onSurfaceVariant",
+    "surfaceContainer", "surfaceContainerHigh", "surfaceContainerHighest",
+    "primary", "onPrimary", "primaryContainer", "onPrimaryContainer",
+    "secondaryContainer", "onSecondaryContainer",
+    "tertiaryContainer", "onTertiaryContainer",
+    "outline", "outlineVariant",
+)
+
+
+class Theme:
+    def __init__(self, name, accent, is_dark, roles):
+        self.name = name
+        self.accent = accent
+        self.is_dark = is_dark
+        self.roles = roles
+
+    def __getitem__(self, role):
+        return self.roles[role]
+
+    def __repr__(self):
+        return f"Theme({self.name!r}, {self.accent!r}, dark={self.is_dark})"
+
+
+def to_hex(argb):
+    return f"#{argb & 0xFFFFFF:06X}"
+
+def parse_accent(accent):
+    value = (accent or "").strip().lstrip('#')
+    if len(value) == 6:
+        try:
+            return 0xFF000000 | int(value, 16)
+        except ValueError:
+            pass
+    return 0xFF000000 | int(DEFAULT_ACCENT[1:], 16)
+
+def accentVariants(seed):
+    # The seed's hue and chroma at a light and a dark tone. Cheap HCT math,
+    # so a different seed can be picked without touching the image again.
+    argb = seed if isinstance(seed, int) else parse_accent(seed)
+    source = Hct.from_int(argb)
+    return {
+        "light": to_hex(Hct.from_hct(source.hue, source.chroma, LIGHT_ACCENT_TONE).to_int()),
+        "dark": to_hex(Hct.from_hct(source.hue, source.chroma, DARK_ACCENT_TONE).to_int()),
+        "fetched": to_hex(argb),
+    }
+
+def themeFor(accent, name=DEFAULT_THEME, contrast=0.0):
+    if name not in THEMES:
+        name = DEFAULT_THEME
+    argb = parse_accent(accent)
+    return build_theme(argb, name, contrast)
+
+@lru_cache(maxsize=32)
+def build_theme(argb, name, contrast):
+    # Keyed on the parsed ARGB value, so "#e2b895" and "E2B895" share an entry
+    # and switching back to a theme seen before costs a dict lookup.
+    source = Hct.from_int(argb)
+    # A fetched accent keeps its own lightness: dark wallpapers give a dark
+    # scheme and light ones a light scheme.
+    is_dark = name == "dark" or (name == "fetched" and source.tone < 50)
+    scheme = SchemeTonalSpot(source, is_dark, contrast)
+    roles = {role: to_hex(getattr(MaterialDynamicColors, role).get_argb(scheme)) for role in ROLES}
+    return Theme(name, to_hex(argb), is_dark, roles)
@@ -0,0 +1,165 @@
+import os
+import sys
+import glob
+import json
+import time
+import atexit
+import functools
+import threading
+import multiprocessing
+
+# MATUCALC_TRACE=trace.json writes a Chrome trace (chrome://tracing or
+# ui.perfetto.dev), MATUCALC_TRACE=summary prints a table on exit, and
+# "summary,trace.json" does both. Unset, every span() is a no-op.
+TRACE_ENV = "MATUCALC_TRACE"
+
+_enabled = False
+_path = None
+_summary = False
+_events = []
+_local = threading.local()
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        _local.depth = getattr(_local, "depth", 0) + 1
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        end = time.perf_counter_ns()
+        _local.depth -= 1
+        event = {
+            "name": self.name,
+            "ph": "X",
+            # perf_counter is CLOCK_MONOTONIC on Linux, so worker processes
+            # land on the same timeline as the GUI process.
+            "ts": self.start / 1000,
+            "dur": (end - self.start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        if self.args:
+            event["args"] = self.args
+        _events.append(event)
+        if _local.depth == 0 and is_worker():
+            flush_part()
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+def span(name, **args):
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, args)
+
+def traced(name=None):
+    def decorate(function):
+        label = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with Span(label, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def isEnabled():
+    return _enabled
+
+def is_worker():
+    return multiprocessing.parent_process() is not None
+
+def part_path(pid):
+    return f"{_path or 'trace'}.{pid}.part"
+
+def flush_part():
+    # Worker processes are usually terminated rather than exited, so they
+    # hand their events over after every top-level span instead of at exit.
+    global _events
+    events, _events = _events, []
+    if not events:
+        return
+    with open(part_path(os.getpid()), "a") as file:
+        for event in events:
+            file.write(json.dumps(event) + "\n")
+
+def collect():
+    events = list(_events)
+    for path in glob.glob(f"{glob.escape(_path or 'trace')}.*.part"):
+        try:
+            with open(path, "r") as file:
+                events.extend(json.loads(line) for line in file if line.strip())
+            os.remove(path)
+        except (OSError, json.JSONDecodeError):
+            continue
+    events.sort(key=lambda event: event["ts"])
+    return events
+
+def summarize(events, output=sys.stderr):
+    totals = {}
+    for event in events:
+        count, total, longest = totals.get(event["name"], (0, 0.0, 0.0))
+        totals[event["name"]] = (count + 1, total + event["dur"], max(longest, event["dur"]))
+    output.write(f"{'span':40} {'count':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}\n")
+    for name, (count, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        output.write(f"{name:40} {count:>7} {total / 1000:>10.2f} {total / count / 1000:>9.3f} {longest / 1000:>9.3f}\n")
+
+def writeTrace():
+    if not _enabled:
+        return
+    if is_worker():
+        flush_part()
+        return
+    events = collect()
+    if _path:
+        tmp_path = _path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        os.replace(tmp_path, _path)
+    if _summary:
+        summarize(events)
+
+def enable(path=None, summary=False):
+    global _enabled, _path, _summary
+    _path = path
+    _summary = summary
+    if not _enabled:
+        atexit.register(writeTrace)
+    _enabled = bool(path or summary)
+
+def configure_from_env():
+    value = os.environ.get(TRACE_ENV, "").strip()
+    if not value:
+        return
+    tokens = [token.strip() for token in value.split(",") if token.strip()]
+    summary = "summary" in tokens
+    paths = [token for token in tokens if token != "summary"]
+    enable(os.path.abspath(paths[0]) if paths else None, summary)
+
+configure_from_env()